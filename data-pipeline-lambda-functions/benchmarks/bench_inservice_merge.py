@@ -0,0 +1,163 @@
+"""
+Benchmarks how Order API enrichment results are collected into the loaners DataFrame.
+
+Both strategies run against the local Order API stand-in through the shared HTTP
+transport and the AdaptiveScheduler, so only the collection differs:
+
+- ``columnar`` is the shipped ``OrderClient._get_inservice_dates``: VINs are read
+  from a plain array, results are stored by position and merged in one step.
+- ``per_row`` is the reference it replaced: items built with ``iterrows()`` and
+  each coroutine writing ``loaners_df.at[index, "in_service_date"]``.
+
+The Order API answers with no latency by default, so the timings are dominated
+by the client's own event-loop and DataFrame work. The stand-in serves from a
+thread of the same process and shares the client's CPU, so the absolute
+throughput is a floor; compare the two strategies. Each size runs in a fresh
+interpreter, and no VIN cache is used, so every repeat fetches every VIN.
+
+Usage:
+    python benchmarks/bench_inservice_merge.py [--sizes 10000 100000] [--repeat 1] [--latency 0]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from stand_ins import MockVolvoAPI, StageTimer, local_aws, peak_rss_mb, run_isolated
+
+VOLVO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda", "volvo-infleet")
+
+
+def build_loaners(vins):
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            "vin": vins,
+            "retailerName": "Bench Retailer",
+            "retailerCode": "R001",
+            "globalRetailerCode": "6US12345",
+            "statusDate": "2024-06-01",
+            "lastModifiedDate": pd.Timestamp("2024-06-01T12:00:00Z"),
+        }
+    )
+
+
+async def per_row_reference(order_client, token, loaners_df):
+    """The per-row collection ``_get_inservice_dates`` used before results were collected by position."""
+    from libs.adaptive_scheduler import AdaptiveScheduler, RetryableError, parse_retry_after
+    from libs.api_client import ORDER_API_INITIAL_CONCURRENCY, ORDER_API_MAX_CONCURRENCY
+
+    base_url = order_client.secrets["base_url"]
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Ocp-Apim-Subscription-Key": order_client.secrets["subscription_key"],
+        "Api-Version": "2.0",
+    }
+    policy = order_client.transport.retry_policy
+
+    async def fetch_in_service_date(item):
+        index, vin = item
+        resp = await order_client.transport.request("GET", f"{base_url}/{vin}", retry=False, headers=headers)
+        if policy.is_retryable(resp.status_code):
+            raise RetryableError(f"HTTP {resp.status_code} for VIN {vin}", status=resp.status_code,
+                                 retry_after=parse_retry_after(resp.headers.get("Retry-After")))
+        resp.raise_for_status()
+        loaners_df.at[index, "in_service_date"] = order_client._handover_date(resp.json())
+
+    scheduler = AdaptiveScheduler(
+        initial_concurrency=ORDER_API_INITIAL_CONCURRENCY,
+        max_concurrency=ORDER_API_MAX_CONCURRENCY,
+        max_retries=policy.max_retries,
+        base_backoff=policy.base_backoff,
+        max_backoff=policy.max_backoff,
+    )
+    stats = await scheduler.run(
+        ((index, row["vin"]) for index, row in loaners_df.iterrows()), fetch_in_service_date
+    )
+    for index, _ in stats.failures:
+        loaners_df.at[index, "in_service_date"] = None
+    return loaners_df.dropna(subset=["in_service_date"])
+
+
+def run_case(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench-merge-")
+    os.environ.update({
+        "ENV": "bench",
+        "VOLVO_INFLEET_ORDER": "bench-volvo-order",
+        "TOKEN_CACHE_DIR": os.path.join(workdir, "tokens"),
+    })
+    sys.path.insert(0, VOLVO_DIR)
+
+    vins = [f"YV1BENCH{i:09d}" for i in range(args.vins)]
+    with MockVolvoAPI(vins, args.latency) as api, local_aws():
+        import boto3
+        from libs.api_client import OrderClient
+
+        if not args.verbose:
+            logging.getLogger("OEM_Infleeter").setLevel(logging.WARNING)
+
+        boto3.client("secretsmanager").create_secret(
+            Name="bench-volvo-order", SecretString=json.dumps(api.secret("orders"))
+        )
+        order_client = OrderClient()
+        token = order_client.parse_token(configs=None)
+
+        strategies = {
+            "per_row": lambda loaners_df: per_row_reference(order_client, token, loaners_df),
+            "columnar": lambda loaners_df: order_client._get_inservice_dates(token, loaners_df),
+        }
+        # The stand-in has no handover date for VINs ending in 0
+        expected = [vin for vin in vins if not vin.endswith("0")]
+        timer = StageTimer()
+        for _ in range(args.repeat):
+            for name, strategy in strategies.items():
+                loaners_df = build_loaners(vins)
+                started = time.perf_counter()
+                enriched = order_client.transport.run(strategy(loaners_df))
+                timer.record(name, time.perf_counter() - started)
+                if enriched["vin"].tolist() != expected:
+                    raise RuntimeError(f"{name} enriched {len(enriched)} of {len(expected)} VINs")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    stages = timer.summary()
+    per_row, columnar = stages["per_row"]["p50_seconds"], stages["columnar"]["p50_seconds"]
+    return {
+        "benchmark": "volvo.inservice_merge",
+        "vins": args.vins,
+        "repeat": args.repeat,
+        "api_latency_seconds": args.latency,
+        "api_calls": api.counts,
+        "per_row_vins_per_second": round(args.vins / per_row) if per_row else None,
+        "columnar_vins_per_second": round(args.vins / columnar) if columnar else None,
+        "speedup": round(per_row / columnar, 2) if columnar else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--vins", type=int, help=argparse.SUPPRESS)  # one case, in this process
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean Order API latency, seconds.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the client's INFO logs.")
+    args = parser.parse_args()
+
+    if args.vins:
+        print(json.dumps(run_case(args)))
+        return
+
+    options = ["--repeat", str(args.repeat), "--latency", str(args.latency)]
+    report = [run_isolated(__file__, ["--vins", str(size), *options]) for size in args.sizes]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
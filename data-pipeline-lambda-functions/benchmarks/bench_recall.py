@@ -0,0 +1,170 @@
+"""
+Benchmarks the recall lambda's ``process_region`` end to end against local stand-ins.
+
+A synthetic RecallMasters CSV is served by an in-process SFTP server, credentials
+come from moto's Secrets Manager and the filtered output lands in moto's S3. Each
+size runs in a fresh interpreter, so peak RSS and the first (cold) run belong to
+that size alone. Later repeats reuse the SFTP connection, like a warm container.
+
+Reports rows/s, MiB/s, peak RSS and p50/p99 per stage as JSON.
+
+Usage:
+    python benchmarks/bench_recall.py [--sizes 10000 1000000] [--repeat 3]
+        [--mode staged|streaming] [--output-format csv|csv.gz|parquet] [--output report.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from stand_ins import LocalSFTPServer, StageTimer, local_aws, peak_rss_mb, run_isolated
+
+RECALL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda", "recall")
+REMOTE_FILENAME = "DEALERWARE-INV_20240601_120000_output.csv"
+
+
+def write_csv(path: str, rows: int, chunk_rows: int = 250_000) -> None:
+    """Write a synthetic inventory file; about 80% of rows have status 'ok'."""
+    rng = np.random.default_rng(7)
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        numbers = np.arange(start, start + size)
+        frame = pd.DataFrame(
+            {
+                "vin": np.char.add("1HGCM82633A", np.char.zfill(numbers.astype(str), 6)),
+                "dealer_code": np.char.add("D", (numbers % 5000).astype(str)),
+                "make": "Honda",
+                "model": "Accord",
+                "model_year": 2018 + numbers % 7,
+                "recall_id": np.char.add("24V", (numbers % 900).astype(str)),
+                "status": np.where(rng.random(size) < 0.8, "ok", "remedy_not_available"),
+                "last_checked": "2024-06-01",
+            }
+        )
+        frame.to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def run_case(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench-recall-")
+    os.makedirs(os.path.join(workdir, "outgoing"))
+    source = os.path.join(workdir, "outgoing", REMOTE_FILENAME)
+    write_csv(source, args.rows)
+    input_bytes = os.path.getsize(source)
+
+    os.environ["PIPELINE_MODE"] = args.mode
+    os.environ["OUTPUT_FORMAT"] = args.output_format
+    sys.path[:0] = [os.path.join(RECALL_DIR, "libs"), RECALL_DIR]
+
+    with LocalSFTPServer(workdir) as server, local_aws():
+        import boto3
+        import lambda_function
+        from config import Config
+        from file_processor import FileProcessor
+        from host_key_cache import host_key_cache
+        from s3_client import S3Client
+        from secrets_manager import SecretsManager
+        from sftp_client import SFTPClient
+
+        if not args.verbose:
+            logging.getLogger("RecallMastersIntegration").setLevel(logging.WARNING)
+
+        # Trust the local server's key instead of running ssh-keyscan
+        host_key_cache.cache_path = os.path.join(workdir, "host_keys.json")
+        host_key_cache.known_hosts_path = os.path.join(workdir, "known_hosts")
+        host_key_cache._scan = lambda host: server.host_key_base64
+
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket=Config.S3_BUCKET)
+        boto3.client("secretsmanager").create_secret(
+            Name=Config.US_SECRET_NAME,
+            SecretString=json.dumps({
+                "sftp_username": server.username,
+                "sftp_password": server.password,
+                "sftp_port": server.port,
+            }),
+        )
+
+        timer = StageTimer()
+        timer.wrap(SecretsManager, "get_credentials", "secrets")
+        timer.wrap(SFTPClient, "connect", "sftp_connect")
+        timer.wrap(S3Client, "load_cursor", "s3_load_cursor")
+        timer.wrap(SFTPClient, "get_new_files", "sftp_list")
+        timer.wrap(SFTPClient, "download_file", "sftp_download")
+        timer.wrap(FileProcessor, "process_csv", "filter")
+        timer.wrap(S3Client, "upload_file", "s3_upload")
+        timer.wrap(S3Client, "upload_stream", "stream_filter_upload")
+
+        totals = []
+        for _ in range(args.repeat):
+            # Start from an empty landing zone so every repeat transfers the file again
+            for page in s3.get_paginator("list_objects_v2").paginate(Bucket=Config.S3_BUCKET):
+                for item in page.get("Contents", []):
+                    s3.delete_object(Bucket=Config.S3_BUCKET, Key=item["Key"])
+
+            started = time.perf_counter()
+            result = lambda_function.process_region("US", "127.0.0.1", Config.US_SECRET_NAME)
+            totals.append(time.perf_counter() - started)
+            if result["statusCode"] != 200 or "Successfully" not in result["body"]:
+                raise RuntimeError(f"process_region failed: {result}")
+            timer.record("process_region", totals[-1])
+
+        output_bytes = sum(
+            item["Size"]
+            for page in s3.get_paginator("list_objects_v2").paginate(
+                Bucket=Config.S3_BUCKET, Prefix=Config.S3_BASE_PREFIX
+            )
+            for item in page.get("Contents", [])
+        )
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    stages = timer.summary()
+    p50 = stages["process_region"]["p50_seconds"]
+    return {
+        "benchmark": "recall.process_region",
+        "rows": args.rows,
+        "mode": args.mode,
+        "output_format": args.output_format,
+        "repeat": args.repeat,
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "cold_seconds": round(totals[0], 4),
+        "rows_per_second": round(args.rows / p50) if p50 else None,
+        "mib_per_second": round(input_bytes / (1024 * 1024) / p50, 2) if p50 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)  # one case, in this process
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mode", choices=["staged", "streaming"], default="staged")
+    parser.add_argument("--output-format", choices=["csv", "csv.gz", "parquet"], default="csv")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the lambda's INFO logs.")
+    args = parser.parse_args()
+
+    if args.rows:
+        print(json.dumps(run_case(args)))
+        return
+
+    options = ["--repeat", str(args.repeat), "--mode", args.mode, "--output-format", args.output_format]
+    report = [run_isolated(__file__, ["--rows", str(size), *options]) for size in args.sizes]
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmarks the Volvo InFleet ``lambda_handler`` end to end against local stand-ins.
+
+The auth, Loaner and Order APIs are served by an aiohttp mock with configurable
+latency and error rates. Secrets come from moto's Secrets Manager and the payload
+lands in moto's S3. Each size runs in a fresh interpreter, so peak RSS and the
+first (cold) run belong to that size alone. The VIN cache is cleared before every
+repeat so each one enriches every VIN.
+
+Reports VINs/s, peak RSS, API call counts and p50/p99 per stage as JSON.
+
+Usage:
+    python benchmarks/bench_volvo.py [--sizes 1000 10000] [--repeat 3] [--latency 0.02]
+        [--error-rate 0.01] [--throttle-rate 0.01] [--output-format csv] [--output report.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from stand_ins import MockVolvoAPI, StageTimer, local_aws, peak_rss_mb, run_isolated
+
+VOLVO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda", "volvo-infleet")
+BUCKET = "bench-landing-zone"
+
+
+def run_case(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench-volvo-")
+    vin_cache_path = os.path.join(workdir, "vin_cache.json.gz")
+    os.environ.update({
+        "ENV": "bench",
+        "LZ_BUCKET": BUCKET,
+        "TARGET_DIR": "data/infleet/volvo/",
+        "OUTPUT_FORMAT": args.output_format,
+        "VOLVO_INFLEET_LOANER": "bench-volvo-loaner",
+        "VOLVO_INFLEET_ORDER": "bench-volvo-order",
+        "TOKEN_CACHE_DIR": os.path.join(workdir, "tokens"),
+        "VIN_CACHE_PATH": vin_cache_path,
+        "SYNC_STATE_PATH": os.path.join(workdir, "sync_checkpoint.json"),
+    })
+    sys.path.insert(0, VOLVO_DIR)
+
+    vins = [f"YV1BENCH{i:09d}" for i in range(args.vins)]
+    with MockVolvoAPI(vins, args.latency, args.error_rate, args.throttle_rate) as api, local_aws():
+        import boto3
+        import lambda_function
+        from libs import vin_cache
+        from libs.api_client import LoanerClient, OrderClient
+        from libs.secrets_manager import SecretsManager
+
+        if not args.verbose:
+            logging.getLogger("OEM_Infleeter").setLevel(logging.WARNING)
+
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        secrets = boto3.client("secretsmanager")
+        secrets.create_secret(Name="bench-volvo-loaner", SecretString=json.dumps(api.secret("loaners")))
+        secrets.create_secret(Name="bench-volvo-order", SecretString=json.dumps(api.secret("orders")))
+
+        timer = StageTimer()
+        timer.wrap(SecretsManager, "prefetch", "secrets")
+        timer.wrap(LoanerClient, "parse_token", "token")
+        timer.wrap(LoanerClient, "_get_loaners", "loaners")
+        timer.wrap(OrderClient, "_get_inservice_dates", "order_enrichment")
+        timer.wrap(lambda_function, "payload_to_s3", "s3_payload")
+
+        totals = []
+        for _ in range(args.repeat):
+            vin_cache._memory_layer.clear()
+            if os.path.exists(vin_cache_path):
+                os.remove(vin_cache_path)
+
+            started = time.perf_counter()
+            result = lambda_function.lambda_handler({"sync_date": "2024-01-01"}, None)
+            totals.append(time.perf_counter() - started)
+            if result["statusCode"] != 200:
+                raise RuntimeError(f"lambda_handler failed: {result}")
+            timer.record("lambda_handler", totals[-1])
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    stages = timer.summary()
+    p50 = stages["lambda_handler"]["p50_seconds"]
+    return {
+        "benchmark": "volvo.lambda_handler",
+        "vins": args.vins,
+        "output_format": args.output_format,
+        "repeat": args.repeat,
+        "api_latency_seconds": args.latency,
+        "api_error_rate": args.error_rate,
+        "api_throttle_rate": args.throttle_rate,
+        "api_calls": api.counts,
+        "cold_seconds": round(totals[0], 4),
+        "vins_per_second": round(args.vins / p50) if p50 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--vins", type=int, help=argparse.SUPPRESS)  # one case, in this process
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean Order API latency, seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of Order calls answered 503.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of Order calls answered 429.")
+    parser.add_argument("--output-format", choices=["csv", "csv.gz", "parquet"], default="csv")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the lambda's INFO logs.")
+    args = parser.parse_args()
+
+    if args.vins:
+        print(json.dumps(run_case(args)))
+        return
+
+    options = [
+        "--repeat", str(args.repeat), "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+        "--output-format", args.output_format,
+    ]
+    report = [run_isolated(__file__, ["--vins", str(size), *options]) for size in args.sizes]
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
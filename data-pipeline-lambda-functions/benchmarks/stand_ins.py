@@ -0,0 +1,346 @@
+"""
+Local stand-ins for the services the lambdas talk to, shared by the offline benchmarks.
+
+- ``LocalSFTPServer``: an in-process paramiko SFTP server that serves a local directory.
+- ``MockVolvoAPI``: an aiohttp app for the auth, Loaner and Order endpoints, with
+  configurable latency and error rates.
+- ``local_aws``: moto's in-process S3 and Secrets Manager.
+- ``StageTimer``: wraps functions to time each call, and reports p50/p99 per stage.
+
+Nothing here is shipped in the Lambda images.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import math
+import os
+import random
+import resource
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import paramiko
+from aiohttp import web
+
+
+# --- SFTP ------------------------------------------------------------------------------
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class _SFTPInterface(paramiko.SFTPServerInterface):
+    """Read-only SFTP view of ``root``; remote paths are resolved below it."""
+
+    root = None
+
+    def _local(self, path):
+        return os.path.join(self.root, self.canonicalize(path).lstrip("/"))
+
+    def list_folder(self, path):
+        local = self._local(path)
+        try:
+            entries = []
+            for name in os.listdir(local):
+                attributes = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local, name)))
+                attributes.filename = name
+                entries.append(attributes)
+            return entries
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return paramiko.SFTP_PERMISSION_DENIED
+        try:
+            handle = _SFTPHandle(flags)
+            handle.readfile = open(self._local(path), "rb")
+            return handle
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _SSHServer(paramiko.ServerInterface):
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self.username, self.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class LocalSFTPServer:
+    """SFTP server on 127.0.0.1 serving ``root`` read-only, with password auth."""
+
+    def __init__(self, root, username="bench", password="bench"):
+        self.root = root
+        self.username = username
+        self.password = password
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self.port = self._socket.getsockname()[1]
+        self._transports = []
+
+    @property
+    def host_key_base64(self):
+        """The server's RSA key as it appears in a known_hosts line."""
+        return self.host_key.get_base64()
+
+    def __enter__(self):
+        self._socket.listen(16)
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._socket.close()
+        for transport in self._transports:
+            transport.close()
+
+    def _serve(self):
+        interface = type("SFTPInterface", (_SFTPInterface,), {"root": self.root})
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return
+            # OpenSSH disables Nagle too; without it small replies stall on delayed ACKs
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(connection)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, interface)
+            transport.start_server(server=_SSHServer(self.username, self.password))
+            self._transports.append(transport)
+
+
+# --- Volvo APIs ------------------------------------------------------------------------
+
+
+class MockVolvoAPI:
+    """
+    Serves the auth, Loaner and Order endpoints on 127.0.0.1 from a background thread.
+
+    ``latency`` is the mean Order API latency in seconds (exponentially distributed).
+    ``error_rate`` is the share of Order calls answered 503, and ``throttle_rate`` the
+    share answered 429 with a Retry-After header. A tenth of the VINs have no handover
+    date yet.
+    """
+
+    def __init__(self, vins, latency=0.02, error_rate=0.0, throttle_rate=0.0, seed=7):
+        self.vins = vins
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.counts = {"auth": 0, "loaners": 0, "orders": 0, "errors": 0, "throttled": 0}
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def secret(self, service):
+        """The Secrets Manager payload BaseClient expects for ``service``."""
+        return {
+            "auth_url": f"{self.base_url}/auth",
+            "base_url": f"{self.base_url}/{service}",
+            "client_id": f"bench-{service}",
+            "client_secret": "bench",
+            "subscription_key": "bench",
+            "vendor_code": "BENCH",
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get("/auth", self._auth)
+        app.router.add_get("/loaners", self._loaners)
+        app.router.add_get("/orders/{vin}", self._order)
+        runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _auth(self, request):
+        self.counts["auth"] += 1
+        return web.json_response({"access_token": f"token-{self.counts['auth']}", "expires_in": 3600})
+
+    async def _loaners(self, request):
+        self.counts["loaners"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        await response.write(b"[")
+        for start in range(0, len(self.vins), 1000):
+            records = (
+                json.dumps({
+                    "vin": vin,
+                    "lastModifiedDate": "2024-06-01T12:00:00.000Z",
+                    "retailerName": "Bench Retailer",
+                    "retailerCode": "R001",
+                    "globalRetailerCode": "6US12345",
+                    "statusDate": "2024-06-01",
+                })
+                for vin in self.vins[start:start + 1000]
+            )
+            await response.write((("," if start else "") + ",".join(records)).encode("utf-8"))
+        await response.write(b"]")
+        await response.write_eof()
+        return response
+
+    async def _order(self, request):
+        self.counts["orders"] += 1
+        if self.latency:
+            await asyncio.sleep(self.random.expovariate(1 / self.latency))
+        draw = self.random.random()
+        if draw < self.error_rate:
+            self.counts["errors"] += 1
+            return web.Response(status=503)
+        if draw < self.error_rate + self.throttle_rate:
+            self.counts["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": "0.1"})
+        vin = request.match_info["vin"]
+        handover = None if vin.endswith("0") else "2023-06-01"
+        return web.json_response(
+            {"responseDetails": {"order": {"vehicleOrderDetails": {"customer": {"customerHandoverDate": handover}}}}}
+        )
+
+
+# --- AWS -------------------------------------------------------------------------------
+
+
+@contextmanager
+def local_aws(region="us-east-1"):
+    """Point boto3 at moto's in-process S3 and Secrets Manager with dummy credentials."""
+    from moto import mock_aws
+
+    os.environ.update({
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_SESSION_TOKEN": "bench",
+        "AWS_DEFAULT_REGION": region,
+    })
+    with mock_aws():
+        yield
+
+
+# --- Measurement -----------------------------------------------------------------------
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class StageTimer:
+    """Records the duration of every call to the functions it wraps, per stage name."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def wrap(self, owner, attribute, stage=None):
+        """Replace ``owner.attribute`` with a timed version; works for coroutine functions too."""
+        stage = stage or f"{getattr(owner, '__name__', owner)}.{attribute}"
+        original = inspect.getattr_static(owner, attribute)
+        function = original.__func__ if isinstance(original, (staticmethod, classmethod)) else original
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def timed(*args, **kwargs):
+                with self.stage(stage):
+                    return await function(*args, **kwargs)
+        else:
+            @functools.wraps(function)
+            def timed(*args, **kwargs):
+                with self.stage(stage):
+                    return function(*args, **kwargs)
+
+        if isinstance(original, staticmethod):
+            timed = staticmethod(timed)
+        elif isinstance(original, classmethod):
+            timed = classmethod(timed)
+        setattr(owner, attribute, timed)
+
+    def summary(self):
+        return {
+            stage: {
+                "calls": len(samples),
+                "p50_seconds": round(percentile(samples, 0.50), 4),
+                "p99_seconds": round(percentile(samples, 0.99), 4),
+            }
+            for stage, samples in self.samples.items()
+        }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_isolated(script, arguments):
+    """
+    Run one benchmark case in a fresh interpreter, so peak RSS and cold-start
+    timings belong to that case alone.
+
+    :return: The JSON document the case printed on its last stdout line.
+    """
+    import subprocess
+
+    completed = subprocess.run(
+        [sys.executable, script, *arguments], capture_output=True, text=True, check=False
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(script)} {' '.join(arguments)} failed:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
@@ -1,14 +1,24 @@
 # lambda_function.py
-from libs.config import Config
-from libs.sftp_client import SFTPClient
-from libs.s3_client import S3Client
-from libs.secrets_manager import SecretsManager
-from libs.file_processor import FileProcessor
-from libs.logger import logger
+# Imported first so the handler's import time is measured from here. The libs
+# are imported by their PYTHONPATH names only, so each is loaded once, not once
+# as libs.X and again as X from inside the other libs.
+from startup import startup
+from config import Config
+from sftp_client import SFTPClient
+from s3_client import S3Client
+from secrets_manager import SecretsManager
+from file_processor import FileProcessor
+from logger import logger
+from run_metrics import run_metrics
+from structured_logging import flush_logs
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import contextmanager
 import tempfile
 
+startup.mark_initialized()
+
 @contextmanager
 def temporary_file():
     """Context manager for handling temporary files"""
@@ -19,7 +29,109 @@ def temporary_file():
         if os.path.exists(temp_file.name):
             os.unlink(temp_file.name)
 
-def process_region(region, host, secret_name):
+def stream_to_s3(region, sftp, s3, remote_path, filename):
+    """Filter the remote file on the fly and upload it to S3 without staging in /tmp"""
+    logger.info(f"Streaming file to S3: {remote_path}", 
+               extra={'region': region, 'file': remote_path})
+    
+    stats = FileProcessor.new_stats()
+    with sftp.open_stream(remote_path) as remote_stream:
+        s3_key = s3.upload_stream(FileProcessor.iter_filtered_output(remote_stream, stats, region=region), 
+                                  filename, region.lower())
+    FileProcessor.log_stats(stats)
+    
+    logger.info(f"File successfully processed and uploaded to S3: {s3_key}", 
+               extra={'region': region, 'file': filename, 's3_key': s3_key})
+    return {
+        'statusCode': 200,
+        'body': f'Successfully processed {region} file: {filename}'
+    }
+
+def transfer_file(region, sftp, s3, remote_path):
+    """Download, filter and upload a single remote file"""
+    filename = os.path.basename(remote_path)
+    
+    if Config.PIPELINE_MODE == 'streaming':
+        return stream_to_s3(region, sftp, s3, remote_path, filename)
+            
+    # Use context manager for temporary file handling
+    with temporary_file() as local_path:
+        logger.info(f"Downloading file to: {local_path}", 
+                   extra={'region': region, 'file': remote_path})
+        
+        # Download and process file
+        sftp.download_file(remote_path, local_path)
+        
+        if FileProcessor.process_csv(local_path, region=region):
+            # Upload to S3
+            s3_key = s3.upload_file(local_path, filename, region.lower())  # Use the filename here
+            logger.info(f"File successfully processed and uploaded to S3: {s3_key}", 
+                       extra={'region': region, 'file': filename, 's3_key': s3_key})
+            return {
+                'statusCode': 200,
+                'body': f'Successfully processed {region} file: {filename}'
+            }
+        else:
+            logger.error(f"Failed to process file: {filename}", 
+                       extra={'region': region, 'file': filename})
+            return {
+                'statusCode': 500,
+                'body': f'Failed to process {region} file: {filename}'
+            }
+
+def backfill_region(region, sftp, s3, max_files=None, max_bytes=None):
+    """Transfer every remote file missing from S3, within a per-run file and byte budget"""
+    max_files = max_files or Config.BACKFILL_MAX_FILES
+    max_bytes = max_bytes or Config.BACKFILL_MAX_BYTES
+    
+    remote_files = sftp.list_files(Config.get_file_pattern(region))
+    s3.index_region(region.lower())
+    missing = [f for f in remote_files if not s3.file_exists(f.filename, region.lower())]
+    
+    # Oldest first so an interrupted catch-up resumes where it stopped
+    missing.sort(key=lambda f: f.st_mtime)
+    selected, selected_bytes = [], 0
+    for remote_file in missing:
+        if len(selected) >= max_files:
+            break
+        if selected and selected_bytes + remote_file.st_size > max_bytes:
+            break
+        selected.append(remote_file)
+        selected_bytes += remote_file.st_size
+    logger.info(f"Backfilling {len(selected)} of {len(missing)} missing {region} files ({selected_bytes} bytes)",
+               extra={'region': region, 'files': [f.filename for f in selected]})
+    
+    # Each worker borrows its own SFTP session; one channel can't serve parallel transfers
+    sessions = queue.Queue()
+    sessions.put(sftp)
+    for session_id in range(1, min(Config.BACKFILL_CONCURRENCY, len(selected))):
+        sessions.put(sftp.new_session(session_id))
+    
+    def backfill_file(remote_file):
+        session = sessions.get()
+        try:
+            return transfer_file(region, session, s3, f"{Config.SFTP_PATH}/{remote_file.filename}")
+        except Exception as e:
+            logger.error(f"Error backfilling {region} file {remote_file.filename}: {str(e)}", 
+                        extra={'region': region, 'file': remote_file.filename}, exc_info=True)
+            return {
+                'statusCode': 500,
+                'body': f'Error processing {region} file: {remote_file.filename}: {str(e)}'
+            }
+        finally:
+            sessions.put(session)
+    
+    with ThreadPoolExecutor(max_workers=max(1, sessions.qsize())) as executor:
+        results = list(executor.map(backfill_file, selected))
+    
+    failed = sum(1 for result in results if result['statusCode'] != 200)
+    return {
+        'statusCode': 500 if failed else 200,
+        'body': f'Backfilled {len(results) - failed} of {len(missing)} missing {region} files',
+        'files': results
+    }
+
+def process_region(region, host, secret_name, backfill=False):
     """Process files for a specific region (US or CA)"""
     logger.info(f"Starting processing for region: {region}")
     
@@ -35,16 +147,24 @@ def process_region(region, host, secret_name):
         # Initialize and setup SFTP client
         sftp = SFTPClient(host, creds['username'], creds['password'], creds['port'])
         sftp.setup_connection()
+        sftp.connect()
         logger.info(f"SFTP connection established for {region}")
         
-        # Get latest file
-        latest_file = sftp.get_latest_file()
-        if not latest_file:
-            logger.warning(f"No files found in {region} SFTP server", extra={'region': region})
+        if backfill:
+            return backfill_region(region, sftp, s3)
+        
+        # Get latest file newer than the persisted listing cursor
+        cursor = s3.load_cursor(region.lower())
+        new_files = sftp.get_new_files(cursor, limit=1)
+        if not new_files:
+            logger.warning(f"No new files found in {region} SFTP server", 
+                          extra={'region': region, 'cursor': cursor})
             return {
                 'statusCode': 200,
                 'body': f'No files found in {region} SFTP server'
             }
+        latest = new_files[0]
+        latest_file = f"{Config.SFTP_PATH}/{latest.filename}"
         
         # Extract just the filename from the full path
         filename = os.path.basename(latest_file)  # Get only the filename
@@ -54,36 +174,16 @@ def process_region(region, host, secret_name):
         if s3.file_exists(filename, region.lower()):  # Use the filename here
             logger.info(f"File {filename} already exists in S3", 
                        extra={'region': region, 'file': filename})
+            s3.save_cursor(region.lower(), latest.st_mtime, latest.filename)
             return {
                 'statusCode': 200,
                 'body': f'File already processed for {region}'
             }
 
-                
-        # Use context manager for temporary file handling
-        with temporary_file() as local_path:
-            logger.info(f"Downloading file to: {local_path}", 
-                       extra={'region': region, 'file': latest_file})
-            
-            # Download and process file
-            sftp.download_file(latest_file, local_path)
-            
-            if FileProcessor.process_csv(local_path):
-                # Upload to S3
-                s3_key = s3.upload_file(local_path, filename, region.lower())  # Use the filename here
-                logger.info(f"File successfully processed and uploaded to S3: {s3_key}", 
-                           extra={'region': region, 'file': filename, 's3_key': s3_key})
-                return {
-                    'statusCode': 200,
-                    'body': f'Successfully processed {region} file: {filename}'
-                }
-            else:
-                logger.error(f"Failed to process file: {filename}", 
-                           extra={'region': region, 'file': filename})
-                return {
-                    'statusCode': 500,
-                    'body': f'Failed to process {region} file: {filename}'
-                }
+        result = transfer_file(region, sftp, s3, latest_file)
+        if result['statusCode'] == 200:
+            s3.save_cursor(region.lower(), latest.st_mtime, latest.filename)
+        return result
 
     except Exception as e:
         logger.error(f"Error processing {region} region: {str(e)}", 
@@ -97,36 +197,44 @@ def process_region(region, host, secret_name):
 
 def lambda_handler(event, context):
     """Main Lambda handler"""
+    run_metrics.begin()
     logger.info("Lambda handler started", extra={'event': event})
+    backfill = bool(event.get('backfill', False)) if isinstance(event, dict) else False
     
     try:
-        # Process US files
-        logger.info("Processing US region")
-        us_result = process_region(
-            'US',
-            Config.US_SFTP_HOST,
-            Config.US_SECRET_NAME
-        )
-        
-        # Process Canada files
-        logger.info("Processing CA region")
-        ca_result = process_region(
-            'CA',
-            Config.CA_SFTP_HOST,
-            Config.CA_SECRET_NAME
-        )
+        # Fetch every region's SFTP secret in one batched call before the workers start
+        SecretsManager().prefetch([settings['secret_name'] for settings in Config.REGIONS.values()])
+
+        # Process every configured region concurrently on a bounded worker pool
+        max_workers = max(1, min(Config.MAX_REGION_WORKERS, len(Config.REGIONS)))
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for region, settings in Config.REGIONS.items():
+                logger.info(f"Processing {region} region")
+                futures[executor.submit(process_region, region, settings['host'],
+                                        settings['secret_name'], backfill)] = region
+            
+            for future in as_completed(futures):
+                region = futures[future]
+                try:
+                    results[region] = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {region} region: {str(e)}",
+                                extra={'region': region, 'error': str(e)}, exc_info=True)
+                    results[region] = {
+                        'statusCode': 500,
+                        'body': f'Error processing {region} region: {str(e)}'
+                    }
         
-        # Combine results
+        # Combine results in configured region order
+        body = {f"{region.lower()}_result": results[region] for region in Config.REGIONS}
         response = {
             'statusCode': 200,
-            'body': {
-                'us_result': us_result,
-                'ca_result': ca_result
-            }
+            'body': body
         }
         
-        logger.info("Lambda execution completed successfully", 
-                   extra={'us_result': us_result, 'ca_result': ca_result})
+        logger.info("Lambda execution completed successfully", extra=body)
         return response
         
     except Exception as e:
@@ -135,4 +243,9 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'body': error_msg
-        }
\ No newline at end of file
+        }
+    finally:
+        # One record per run; its _aws block makes CloudWatch publish the figures as metrics
+        logger.info("Run summary", extra=run_metrics.summary(startup.report()))
+        # Logs are written in the background; the container is frozen once this returns
+        flush_logs(logger)
\ No newline at end of file
@@ -1,15 +1,23 @@
 # config.py
+import json
 import os
+import re
 from datetime import datetime
+from output_encoder import output_extension
 
 class Config:
     ENV = os.getenv("ENV", "tst")
     S3_BUCKET = f"madhan-data-{ENV}-landing-zone"
     S3_BASE_PREFIX = "data/recall/output"
+    S3_STATE_PREFIX = "data/recall/state"  # per-region SFTP listing cursors
     
     # SFTP Configuration
     SFTP_PORT = 22
     SFTP_PATH = "/outgoing"
+    KNOWN_HOSTS_PATH = "/tmp/known_hosts"
+    HOST_KEY_CACHE_PATH = "/tmp/host_keys.json"
+    HOST_KEY_TTL_SECONDS = int(os.getenv("HOST_KEY_TTL_SECONDS", "86400"))
+    SFTP_READ_WINDOW = int(os.getenv("SFTP_READ_WINDOW_MB", "8")) * 1024 * 1024  # bytes requested ahead
     # SFTP_OUTGOING_PATH = "/outgoing"
     # SFTP_INCOMING_PATH = "/incoming"
     
@@ -25,8 +33,71 @@ class Config:
     CA_SECRET_NAME = "sftp-ca-server-details"
     CA_FILE_PREFIX = "DEALERWARE-C-INV"
     
+    # Regions processed by lambda_handler, run concurrently on a bounded pool
+    REGIONS = {
+        'US': {'host': US_SFTP_HOST, 'secret_name': US_SECRET_NAME},
+        'CA': {'host': CA_SFTP_HOST, 'secret_name': CA_SECRET_NAME},
+    }
+    MAX_REGION_WORKERS = int(os.getenv("MAX_REGION_WORKERS", "4"))
+    
+    # Backfill Configuration (event {"backfill": true}): per-run budget and parallelism
+    BACKFILL_MAX_FILES = int(os.getenv("BACKFILL_MAX_FILES", "10"))
+    BACKFILL_MAX_BYTES = int(os.getenv("BACKFILL_MAX_BYTES_MB", "4096")) * 1024 * 1024
+    BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "2"))
+
+    # CSV Processing Configuration
+    CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "100000"))  # rows per chunk
+    # CSV parser backend: "pyarrow" (multithreaded Arrow reader, CSV_BLOCK_SIZE_MB per
+    # chunk; falls back to "c" when pyarrow is missing) or "c" (pandas C engine,
+    # CSV_CHUNK_SIZE rows per chunk)
+    CSV_PARSER = os.getenv("CSV_PARSER", "pyarrow")
+    CSV_BLOCK_SIZE = int(os.getenv("CSV_BLOCK_SIZE_MB", "16")) * 1024 * 1024
+    
+    # Row filter per region (see row_filter.compile_filter): rows matching every
+    # "where" predicate are kept and only "columns" (all when None) are parsed and
+    # written. ROW_FILTER_US / ROW_FILTER_CA override a region's spec with JSON.
+    DEFAULT_ROW_FILTER = {
+        'columns': None,
+        'where': [{'column': 'status', 'op': 'eq', 'value': 'ok'}],
+    }
+    ROW_FILTERS = {
+        'US': json.loads(os.getenv("ROW_FILTER_US") or "null") or DEFAULT_ROW_FILTER,
+        'CA': json.loads(os.getenv("ROW_FILTER_CA") or "null") or DEFAULT_ROW_FILTER,
+    }
+    
+    # Output Configuration: "csv", "csv.gz" or "parquet", written under the same YYYY/MM/DD keys
+    OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv")
+    PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "100000"))
+    PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "snappy")
+    
+    # Pipeline mode: "staged" downloads to /tmp before uploading, "streaming"
+    # filters the remote file on the fly straight into an S3 multipart upload
+    PIPELINE_MODE = os.getenv("PIPELINE_MODE", "staged")
+    
+    # S3 Upload Configuration
+    S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16")) * 1024 * 1024
+    S3_PART_SIZE = int(os.getenv("S3_PART_SIZE_MB", "16")) * 1024 * 1024  # raised to the 5 MB S3 minimum
+    S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+    S3_MAX_IN_FLIGHT_PARTS = int(os.getenv("S3_MAX_IN_FLIGHT_PARTS", "6"))
+    S3_CHECKSUM_ALGORITHM = os.getenv("S3_CHECKSUM_ALGORITHM")  # e.g. CRC32, SHA256; unset disables
+    
+    @staticmethod
+    def get_file_prefix(region: str) -> str:
+        """Get the file prefix, which also names the file layout, for a given region"""
+        return Config.US_FILE_PREFIX if (region or 'US').upper() == 'US' else Config.CA_FILE_PREFIX
+    
     @staticmethod
     def get_file_pattern(region: str) -> str:
         """Get the expected file pattern for a given region"""
-        prefix = Config.US_FILE_PREFIX if region.upper() == 'US' else Config.CA_FILE_PREFIX
-        return f"{prefix}_\\d{{8}}_\\d{{6}}_output\\.csv"
\ No newline at end of file
+        prefix = Config.get_file_prefix(region)
+        return f"{prefix}_\\d{{8}}_\\d{{6}}_output\\.csv"
+    
+    @staticmethod
+    def get_row_filter(region: str = None) -> dict:
+        """Get the row filter spec for a region, falling back to the default rule"""
+        return Config.ROW_FILTERS.get((region or '').upper(), Config.DEFAULT_ROW_FILTER)
+    
+    @staticmethod
+    def get_output_filename(filename: str) -> str:
+        """Get the landing-zone filename for a source CSV in the configured output format"""
+        return re.sub(r'\.csv$', '', filename) + output_extension(Config.OUTPUT_FORMAT)
\ No newline at end of file
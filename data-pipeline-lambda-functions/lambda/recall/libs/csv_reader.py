@@ -0,0 +1,159 @@
+# csv_reader.py
+import csv
+import io
+import time
+from collections import defaultdict
+from logger import logger
+from startup import startup
+
+# Column dtypes per file layout, keyed by file prefix. Values always stay text so
+# every row is written back verbatim: "category" for low-cardinality codes and
+# Arrow-backed "string" for everything else, including columns not listed here
+# (Python-backed "string" when pyarrow is not installed).
+CATEGORY = "category"
+STRING = "string[pyarrow]"
+PYTHON_STRING = "string[python]"
+
+# Only columns known to be in the export belong here: the row filter reads
+# "status". A registered column missing from a file's header is logged.
+_INVENTORY_SCHEMA = {
+    'status': CATEGORY,
+}
+
+SCHEMAS = {
+    'DEALERWARE-INV': _INVENTORY_SCHEMA,
+    'DEALERWARE-C-INV': _INVENTORY_SCHEMA,  # the Canadian export shares the US layout
+}
+
+PARSERS = ('c', 'pyarrow')
+
+
+def get_schema(layout):
+    """Get the column dtypes registered for a file layout; unknown layouts are all strings"""
+    return SCHEMAS.get(layout, {})
+
+
+def read_csv_chunks(source, layout=None, usecols=None, chunk_size=100000, block_size=16 * 1024 * 1024,
+                    parser='c'):
+    """Parse a CSV path or binary stream into DataFrames, one chunk at a time
+
+    ``parser`` picks the backend: ``c`` is pandas' C engine, reading
+    ``chunk_size`` rows per chunk, and ``pyarrow`` is Arrow's multithreaded
+    streaming reader, reading ``block_size`` bytes per chunk. Both apply the
+    layout's schema and parse only ``usecols`` when given.
+
+    Returns the backend actually used and the chunk iterator.
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"Unsupported CSV parser: {parser}")
+    schema = get_schema(layout)
+    try:
+        startup.load("pyarrow.csv")
+        has_pyarrow = True
+    except ImportError:
+        has_pyarrow = False
+    if parser == 'pyarrow' and not has_pyarrow:
+        logger.warning("CSV_PARSER is pyarrow but pyarrow is not installed; using the C engine")
+        parser = 'c'
+    if parser == 'pyarrow':
+        chunks = _read_pyarrow(source, schema, usecols, block_size)
+    else:
+        chunks = _read_c(source, schema, usecols, chunk_size, STRING if has_pyarrow else PYTHON_STRING)
+    return parser, _check_schema(chunks, layout, schema, usecols)
+
+
+def _check_schema(chunks, layout, schema, usecols):
+    """Pass chunks through, warning once if registered columns are missing from the file"""
+    first = True
+    for chunk in chunks:
+        if first:
+            first = False
+            missing = [column for column in schema
+                       if column not in chunk.columns and (usecols is None or column in usecols)]
+            if missing:
+                logger.warning(f"Columns registered for layout {layout} are missing from the file: {missing}")
+        yield chunk
+
+
+def _read_c(source, schema, usecols, chunk_size, string_dtype):
+    pd = startup.load("pandas")
+    reader = pd.read_csv(source, chunksize=chunk_size, usecols=usecols,
+                         dtype=defaultdict(lambda: string_dtype, schema),
+                         keep_default_na=False, na_filter=False)
+    with reader:
+        yield from reader
+
+
+def _read_pyarrow(source, schema, usecols, block_size):
+    pd = startup.load("pandas")
+    pa = startup.load("pyarrow")
+    pacsv = startup.load("pyarrow.csv")
+
+    # Every column needs an explicit type, or Arrow would infer numbers and dates
+    # and the output would no longer match the input text
+    source, columns = _read_header(source)
+    category = pa.dictionary(pa.int32(), pa.string())
+    column_types = {column: category if schema.get(column) == CATEGORY else pa.string()
+                    for column in columns}
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        # Quoted values may span lines, as the C engine allows
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types=column_types, include_columns=usecols),
+    )
+    types_mapper = {pa.string(): pd.StringDtype("pyarrow")}.get
+    empty = True
+    for batch in reader:
+        empty = False
+        yield batch.to_pandas(types_mapper=types_mapper)
+    if empty:
+        # A header-only file has no batches; the C engine still yields one empty
+        # frame, which keeps the header in the output
+        yield reader.schema.empty_table().to_pandas(types_mapper=types_mapper)
+
+
+def _read_header(source):
+    """Read the header row, returning a source that still starts with it and the column names"""
+    if isinstance(source, io.IOBase):
+        # readline keeps reading until the newline, however long the header is
+        first_line = source.readline()
+        source = _PrefixedReader(first_line, source)
+    else:
+        with open(source, 'rb') as f:
+            first_line = f.readline()
+    return source, next(csv.reader([first_line.decode('utf-8-sig').rstrip('\r\n')]))
+
+
+class _PrefixedReader(io.RawIOBase):
+    """Binary stream that replays ``prefix`` before the rest of ``stream``"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        prefix, self._prefix = self._prefix, b''
+        if size is None or size < 0:
+            return prefix + self._stream.read()
+        if len(prefix) >= size:
+            self._prefix = prefix[size:]
+            return prefix[:size]
+        return prefix + self._stream.read(size - len(prefix))
+
+
+def timed_chunks(chunks, stats):
+    """Pass chunks through, adding the time spent parsing them to ``stats['parse_seconds']``"""
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            stats['parse_seconds'] += time.perf_counter() - started
+        yield chunk
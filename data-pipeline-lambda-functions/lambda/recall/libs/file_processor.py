@@ -1,27 +1,97 @@
-import pandas as pd
+import os
+import tempfile
+from config import Config
+from csv_reader import read_csv_chunks, timed_chunks
 from logger import logger
+from output_encoder import encode_frames
+from row_filter import compile_filter
+from run_metrics import run_metrics
 
 class FileProcessor:
     @staticmethod
-    def process_csv(local_path):
-        """Process CSV file by filtering rows with status 'ok'"""
+    @run_metrics.timed("filter")
+    def process_csv(local_path, chunk_size=None, output_format=None, region=None):
+        """Process CSV file by applying the region's row filter
+
+        The file is streamed in chunks of ``chunk_size`` rows (defaults to
+        ``Config.CSV_CHUNK_SIZE``) so peak memory depends on the chunk size
+        rather than the file size. Filtered rows are encoded in
+        ``output_format`` (defaults to ``Config.OUTPUT_FORMAT``) into a sibling
+        temporary file which then replaces the original.
+        """
+        fd, output_path = tempfile.mkstemp(dir=os.path.dirname(local_path) or '.')
+        os.close(fd)
         try:
-            df = pd.read_csv(local_path, low_memory=False)
-            initial_count = len(df)
-            
-            df_cleaned = df[df['status'] == 'ok']
-            final_count = len(df_cleaned)
-            
-            df_cleaned.to_csv(local_path, index=False)
+            stats = FileProcessor.new_stats()
+            with open(output_path, 'wb') as output:
+                for data in FileProcessor.iter_filtered_output(local_path, stats, chunk_size,
+                                                               output_format, region):
+                    output.write(data)
             
-            logger.info({
-                'message': 'File processed successfully',
-                'initial_records': initial_count,
-                'final_records': final_count,
-                'records_removed': initial_count - final_count
-            })
+            os.replace(output_path, local_path)
+            FileProcessor.log_stats(stats)
             
             return True
         except Exception as e:
             logger.error(f"Error processing CSV: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+        finally:
+            if os.path.exists(output_path):
+                os.unlink(output_path)
+                
+    @staticmethod
+    def iter_filtered_output(source, stats, chunk_size=None, output_format=None, region=None):
+        """Yield the rows kept by the region's row filter encoded in ``Config.OUTPUT_FORMAT``, chunk by chunk"""
+        return encode_frames(FileProcessor.iter_filtered_chunks(source, stats, chunk_size, region),
+                             output_format or Config.OUTPUT_FORMAT,
+                             row_group_size=Config.PARQUET_ROW_GROUP_SIZE,
+                             compression=Config.PARQUET_COMPRESSION)
+        
+    @staticmethod
+    def iter_filtered_chunks(source, stats, chunk_size=None, region=None):
+        """Yield DataFrames of the rows kept by the region's row filter, one chunk at a time
+
+        ``source`` is a path or a readable binary stream. It is parsed with
+        ``Config.CSV_PARSER`` using the region's file layout schema, and only
+        the columns the filter needs are parsed. Record counts, the parser used
+        and the time spent parsing are accumulated into ``stats`` as chunks
+        are consumed.
+        """
+        chunk_size = chunk_size or Config.CSV_CHUNK_SIZE
+        stats['chunk_size'] = chunk_size
+        # Compiled once per distinct spec and reused by every later file
+        plan = compile_filter(Config.get_row_filter(region))
+        stats['row_filter'] = plan.describe()
+        
+        # Values are kept as text (categorical or string) so every chunk is written
+        # back verbatim, regardless of what dtype pandas would infer for that slice alone
+        parser, chunks = read_csv_chunks(source, Config.get_file_prefix(region), plan.usecols,
+                                         chunk_size, Config.CSV_BLOCK_SIZE, Config.CSV_PARSER)
+        stats['parser'] = parser
+        for chunk in timed_chunks(chunks, stats):
+            stats['initial_records'] += len(chunk)
+            
+            chunk_cleaned = plan.apply(chunk)
+            stats['final_records'] += len(chunk_cleaned)
+            
+            yield chunk_cleaned
+                
+    @staticmethod
+    def new_stats():
+        return {'initial_records': 0, 'final_records': 0, 'parser': None, 'parse_seconds': 0.0}
+        
+    @staticmethod
+    def log_stats(stats):
+        run_metrics.count("rows_in", stats['initial_records'])
+        run_metrics.count("rows_out", stats['final_records'])
+        run_metrics.count("csv_parse_seconds", stats['parse_seconds'])
+        logger.info({
+            'message': 'File processed successfully',
+            'initial_records': stats['initial_records'],
+            'final_records': stats['final_records'],
+            'records_removed': stats['initial_records'] - stats['final_records'],
+            'chunk_size': stats.get('chunk_size'),
+            'row_filter': stats.get('row_filter'),
+            'parser': stats['parser'],
+            'parse_seconds': round(stats['parse_seconds'], 3)
+        })
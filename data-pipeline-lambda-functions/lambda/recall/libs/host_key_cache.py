@@ -0,0 +1,98 @@
+# host_key_cache.py
+import json
+import os
+import subprocess
+import threading
+import time
+from config import Config
+from logger import logger
+from run_metrics import run_metrics
+
+class HostKeyCache:
+    """SSH host key cache keyed by host, kept in process memory and in /tmp
+
+    Keys are fetched with ssh-keyscan only when missing, older than
+    ``Config.HOST_KEY_TTL_SECONDS`` or explicitly refreshed after a failed
+    host key verification. All cached hosts share one known_hosts file.
+    """
+
+    def __init__(self, cache_path=Config.HOST_KEY_CACHE_PATH, known_hosts_path=Config.KNOWN_HOSTS_PATH,
+                 ttl_seconds=Config.HOST_KEY_TTL_SECONDS):
+        self.cache_path = cache_path
+        self.known_hosts_path = known_hosts_path
+        self.ttl_seconds = ttl_seconds
+        self._keys = None
+        self._lock = threading.Lock()
+        
+    def get_known_hosts(self, host, refresh=False):
+        """Return a known_hosts path holding a fresh RSA key for host"""
+        with self._lock:
+            keys = self._load()
+            entry = keys.get(host)
+            if refresh or not entry or time.time() - entry['fetched_at'] > self.ttl_seconds:
+                rsa_key = self._scan(host)
+                if not rsa_key:
+                    raise Exception("Failed to retrieve RSA key")
+                keys[host] = {'key': rsa_key, 'fetched_at': time.time()}
+                self._save(keys)
+                logger.info(f"Cached host key for {host}")
+            elif not os.path.exists(self.known_hosts_path):
+                self._save(keys)
+            else:
+                logger.info(f"Using cached host key for {host}")
+            return self.known_hosts_path
+            
+    def _load(self):
+        """Load cached keys from memory, falling back to the /tmp store"""
+        if self._keys is None:
+            self._keys = {}
+            try:
+                with open(self.cache_path) as f:
+                    self._keys = json.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable host key cache {self.cache_path}: {str(e)}")
+        return self._keys
+        
+    def _save(self, keys):
+        """Persist cached keys and rewrite the shared known_hosts file"""
+        try:
+            self._write_atomic(self.cache_path, json.dumps(keys))
+            self._write_atomic(self.known_hosts_path,
+                               "\n".join(f"{host} ssh-rsa {entry['key']}" for host, entry in keys.items()))
+            os.chmod(self.known_hosts_path, 0o644)
+        except Exception as e:
+            logger.error(f"Error saving host key: {str(e)}")
+            raise
+            
+    @staticmethod
+    def _write_atomic(path, content):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        
+    @staticmethod
+    @run_metrics.timed("host_key_scan")
+    def _scan(host):
+        """Retrieve RSA key using ssh-keyscan"""
+        try:
+            result = subprocess.run(['ssh-keyscan', '-t', 'rsa', host],
+                                  capture_output=True, text=True)
+            
+            if result.returncode != 0:
+                logger.error(f"ssh-keyscan failed: {result.stderr}")
+                return None
+                
+            for line in result.stdout.splitlines():
+                if 'ssh-rsa' in line:
+                    return line.split('ssh-rsa ')[1]
+            
+            return None
+        except Exception as e:
+            logger.error(f"Error getting RSA key: {str(e)}")
+            raise
+
+# Process-wide cache shared by every region
+host_key_cache = HostKeyCache()
@@ -2,14 +2,16 @@
 import logging
 import json
 from datetime import datetime, timezone
-import json_log_formatter
 import sys
+from structured_logging import (LOG_ASYNC, LOG_SAMPLE_RATE, AsyncBatchHandler,
+                                FastJsonFormatter, set_sampling)
 
-class CustomJsonFormatter(json_log_formatter.JSONFormatter):
+class CustomJsonFormatter(FastJsonFormatter):
     def json_record(self, message: str, extra: dict, record: logging.LogRecord) -> dict:
         extra['message'] = message
         extra['severity'] = record.levelname
-        extra['timestamp'] = datetime.now(timezone.utc).isoformat()
+        # Event time, not format time: records are formatted later on the log writer thread
+        extra['timestamp'] = datetime.fromtimestamp(record.created, timezone.utc).isoformat()
         extra['logger'] = record.name
         extra['function'] = record.funcName
         extra['line'] = record.lineno
@@ -28,8 +30,10 @@ def setup_logger(name: str) -> logging.Logger:
     """Setup structured logger for Lambda environment"""
     logger = logging.getLogger(name)
     
-    # Clear any existing handlers
+    # Clear any existing handlers, writing out anything they still queue
     if logger.handlers:
+        for handler in logger.handlers:
+            handler.close()
         logger.handlers.clear()
     
     # Prevent duplicate logs
@@ -40,9 +44,14 @@ def setup_logger(name: str) -> logging.Logger:
     formatter = CustomJsonFormatter()
     handler.setFormatter(formatter)
     
+    # Format and write from a background thread, in batches, off the request path
+    if LOG_ASYNC:
+        handler = AsyncBatchHandler(handler)
+    
     # Add handler and set level
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
+    set_sampling(logger, LOG_SAMPLE_RATE)
     
     return logger
 
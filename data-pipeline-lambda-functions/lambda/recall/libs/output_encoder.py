@@ -0,0 +1,147 @@
+# output_encoder.py
+import zlib
+
+OUTPUT_EXTENSIONS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "parquet": ".parquet",
+}
+
+# Column type aliases accepted in a Parquet schema; unlisted columns are strings
+PARQUET_TYPES = ("string", "int64", "float64", "bool", "timestamp")
+
+
+def output_extension(output_format: str) -> str:
+    """
+    Returns the file extension for an output format.
+
+    :param output_format: One of "csv", "csv.gz" or "parquet".
+    :return: The extension, including the leading dot.
+    """
+    if output_format not in OUTPUT_EXTENSIONS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return OUTPUT_EXTENSIONS[output_format]
+
+
+def iter_row_chunks(frame, chunk_rows=50000):
+    """
+    Splits a DataFrame into consecutive row slices, so a large frame can be
+    encoded chunk by chunk instead of into one big buffer.
+
+    :param frame: The DataFrame to split.
+    :param chunk_rows: Maximum rows per slice.
+    :return: Generator of DataFrame views; an empty frame is yielded as is to keep its header.
+    """
+    if len(frame) == 0:
+        yield frame
+        return
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def encode_frames(frames, output_format="csv", schema=None, row_group_size=100000,
+                  compression="snappy"):
+    """
+    Encodes an iterable of DataFrames sharing the same columns into a stream of bytes.
+
+    :param frames: Iterable of DataFrames, written in order.
+    :param output_format: One of "csv", "csv.gz" or "parquet".
+    :param schema: Parquet only. Mapping of column name to a PARQUET_TYPES alias.
+    :param row_group_size: Parquet only. Maximum rows per row group.
+    :param compression: Parquet only. Column compression codec.
+    :return: Generator of encoded bytes chunks.
+    """
+    output_extension(output_format)
+    if output_format == "parquet":
+        return _encode_parquet(frames, schema or {}, row_group_size, compression)
+    if output_format == "csv.gz":
+        return _gzip(_encode_csv(frames))
+    return _encode_csv(frames)
+
+
+def _encode_csv(frames):
+    for frame_number, frame in enumerate(frames):
+        yield frame.to_csv(index=False, header=frame_number == 0).encode("utf-8")
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for data in chunks:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _encode_parquet(frames, schema, row_group_size, compression):
+    # pyarrow is only needed for Parquet output, so it is imported on demand
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pandas.api.types import is_string_dtype
+
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+    }
+    sink = _DrainableSink()
+    writer = None
+    try:
+        for frame in frames:
+            if writer is None:
+                arrow_schema = pa.schema(
+                    [(column, types[schema.get(column, "string")]) for column in frame.columns]
+                )
+                writer = pq.ParquetWriter(
+                    sink, arrow_schema, compression=compression, use_dictionary=True,
+                    coerce_timestamps="ms", allow_truncated_timestamps=True,
+                )
+            # Unlisted columns holding anything but strings are stringified to match the schema
+            to_string = {
+                column: "string" for column in frame.columns
+                if column not in schema and not is_string_dtype(frame[column])
+            }
+            if to_string:
+                frame = frame.astype(to_string)
+            table = pa.Table.from_pandas(frame, schema=arrow_schema, preserve_index=False, safe=False)
+            writer.write_table(table, row_group_size=row_group_size)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+class _DrainableSink:
+    """Write-only file object whose buffered bytes can be drained while writing continues"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
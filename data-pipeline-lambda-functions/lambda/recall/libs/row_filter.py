@@ -0,0 +1,149 @@
+# row_filter.py
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import List, Optional
+
+
+class FilterPlan:
+    """Compiled row filter and projection for one spec
+
+    ``usecols`` lists the columns the CSV reader has to parse: the projection
+    plus every column a predicate reads, or None when the projection keeps
+    every column. ``apply`` evaluates all predicates as one combined boolean
+    mask and projects the kept rows in a single step.
+    """
+
+    def __init__(self, columns: Optional[List[str]], predicates: List[tuple]):
+        self.columns = columns
+        self.predicates = predicates  # (column, op, mask function)
+        self.predicate_columns = list(dict.fromkeys(column for column, _, _ in predicates))
+        self.usecols = None if columns is None else list(dict.fromkeys(columns + self.predicate_columns))
+
+    def apply(self, chunk):
+        """Return the rows of ``chunk`` matching every predicate, projected to ``columns``"""
+        missing = [column for column in self.usecols or self.predicate_columns if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Row filter columns missing from file: {missing}")
+
+        # Combine the predicates' own arrays; importing numpy here would load it on every cold start
+        mask = slice(None)
+        for column, _, predicate in self.predicates:
+            kept = predicate(chunk[column])
+            mask = kept if isinstance(mask, slice) else mask & kept
+        if self.columns is None:
+            return chunk[mask] if self.predicates else chunk
+        return chunk.loc[mask, self.columns]
+
+    def describe(self):
+        """Short description for logs"""
+        return {
+            'columns': self.columns or 'all',
+            'where': [f"{column} {op}" for column, op, _ in self.predicates]
+        }
+
+
+def compile_filter(spec):
+    """Compile a filter spec into a FilterPlan, reusing the plan for an identical spec
+
+    A spec is ``{'columns': [...] or None, 'where': [predicate, ...]}``. Rows are
+    kept when every predicate holds. A predicate is
+    ``{'column': name, 'op': op, 'value': value}`` with op one of:
+
+    - ``eq``, ``ne``: equal or not equal to ``value``
+    - ``in``, ``not_in``: in or not in the list ``value``
+    - ``startswith``, ``not_startswith``: prefix ``value``, a string or a list
+    - ``matches``: the whole value matches the regular expression ``value``
+    - ``not_empty``: the value is not an empty string
+    - ``within_days``: a date no more than ``value`` days old; ``format`` is
+      an optional strptime format for the column
+    """
+    return _compile(json.dumps(spec, sort_keys=True))
+
+
+@lru_cache(maxsize=32)
+def _compile(spec_json):
+    spec = json.loads(spec_json)
+    unknown = set(spec) - {'columns', 'where'}
+    if unknown:
+        raise ValueError(f"Unknown row filter keys: {sorted(unknown)}")
+
+    predicates = []
+    for predicate in spec.get('where') or []:
+        column, op = predicate.get('column'), predicate.get('op')
+        if not column or op not in _OPERATORS:
+            raise ValueError(f"Invalid row filter predicate: {predicate}")
+        predicates.append((column, op, _OPERATORS[op](predicate)))
+
+    columns = spec.get('columns')
+    return FilterPlan(list(columns) if columns else None, predicates)
+
+
+# Each builder turns a predicate into a function from a column of strings to a boolean array
+
+def _eq(predicate):
+    value = str(predicate['value'])
+    return lambda values: (values == value).to_numpy(dtype=bool, na_value=False)
+
+
+def _ne(predicate):
+    value = str(predicate['value'])
+    return lambda values: (values != value).to_numpy(dtype=bool, na_value=False)
+
+
+def _in(predicate):
+    value = [str(item) for item in predicate['value']]
+    return lambda values: values.isin(value).to_numpy(dtype=bool, na_value=False)
+
+
+def _not_in(predicate):
+    value = [str(item) for item in predicate['value']]
+    return lambda values: ~values.isin(value).to_numpy(dtype=bool, na_value=False)
+
+
+def _startswith(predicate):
+    value = predicate['value']
+    prefixes = (value,) if isinstance(value, str) else tuple(value)
+    return lambda values: values.str.startswith(prefixes).to_numpy(dtype=bool, na_value=False)
+
+
+def _not_startswith(predicate):
+    matches = _startswith(predicate)
+    return lambda values: ~matches(values)
+
+
+def _matches(predicate):
+    pattern = re.compile(predicate['value'])
+    return lambda values: values.str.fullmatch(pattern.pattern).to_numpy(dtype=bool, na_value=False)
+
+
+def _not_empty(predicate):
+    return lambda values: (values.str.len() > 0).to_numpy(dtype=bool, na_value=False)
+
+
+def _within_days(predicate):
+    days = float(predicate['value'])
+    date_format = predicate.get('format')
+
+    def mask(values):
+        # pandas is already loaded by the CSV reader by the time a chunk is filtered
+        import pandas as pd
+        dates = pd.to_datetime(values, format=date_format, errors='coerce', utc=True)
+        # The cut-off is taken per chunk so warm containers never reuse a stale one
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        return (dates >= cutoff).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+_OPERATORS = {
+    'eq': _eq,
+    'ne': _ne,
+    'in': _in,
+    'not_in': _not_in,
+    'startswith': _startswith,
+    'not_startswith': _not_startswith,
+    'matches': _matches,
+    'not_empty': _not_empty,
+    'within_days': _within_days,
+}
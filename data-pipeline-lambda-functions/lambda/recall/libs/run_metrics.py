@@ -0,0 +1,130 @@
+# run_metrics.py
+import functools
+import inspect
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# CloudWatch units keyed by metric name suffix; everything else is a Count
+_UNITS = (("_seconds", "Seconds"), ("_bytes", "Bytes"), ("_mb", "Megabytes"))
+
+
+class RunMetrics:
+    """Per-invocation stage timings and counters
+
+    Stages are timed with ``span`` (or the ``timed`` decorator) and quantities
+    such as bytes, rows and HTTP calls are added with ``count``. ``summary``
+    returns one record per invocation that is also a CloudWatch Embedded Metric
+    Format document, so logging it as JSON publishes the metrics.
+    """
+
+    def __init__(self, namespace: str, function_name: str):
+        self.namespace = namespace
+        self.function_name = function_name
+        self._lock = threading.Lock()
+        self.begin()
+
+    def begin(self) -> None:
+        """Start a new invocation, dropping whatever the previous one recorded"""
+        with self._lock:
+            self._started = time.perf_counter()
+            self._spans: Dict[str, list] = {}  # name -> [seconds, calls]
+            self._counters: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        """Add the time spent in the block to stage ``name``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                totals = self._spans.setdefault(name, [0.0, 0])
+                totals[0] += elapsed
+                totals[1] += 1
+
+    def timed(self, name: str):
+        """Decorator timing every call of a function, or coroutine function, as stage ``name``"""
+        def decorate(function):
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await function(*args, **kwargs)
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Add ``value`` to counter ``name``; a ``_bytes`` suffix makes it a Bytes metric"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def track_aws_calls(self, client: Any) -> Any:
+        """Count every API call ``client`` makes as ``aws_calls``, and return the client"""
+        client.meta.events.register(
+            "after-call", self._on_aws_call, unique_id="run_metrics.aws_calls"
+        )
+        return client
+
+    def _on_aws_call(self, **kwargs) -> None:
+        self.count("aws_calls")
+
+    def summary(self, properties: Optional[dict] = None) -> dict:
+        """Summarise this invocation as one Embedded Metric Format record
+
+        Stage durations become ``<stage>_seconds`` metrics and counters keep
+        their names. ``properties`` are added as plain fields, which CloudWatch
+        keeps searchable in Logs Insights without turning them into metrics.
+        """
+        with self._lock:
+            values = {
+                "run_seconds": round(time.perf_counter() - self._started, 4),
+                "peak_rss_mb": _peak_rss_mb(),
+            }
+            calls = {}
+            for name, (seconds, count) in sorted(self._spans.items()):
+                values[f"{name}_seconds"] = round(seconds, 4)
+                calls[name] = count
+            values.update(sorted(self._counters.items()))
+
+        record = dict(properties or {})
+        record.update(values)
+        record["stage_calls"] = calls
+        record["Function"] = self.function_name
+        record["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": self.namespace,
+                "Dimensions": [["Function"]],
+                "Metrics": [{"Name": name, "Unit": _unit(name)} for name in values],
+            }],
+        }
+        return record
+
+
+def _unit(name: str) -> str:
+    return next((unit for suffix, unit in _UNITS if name.endswith(suffix)), "Count")
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this container so far, in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Shared by every module in this container
+run_metrics = RunMetrics(
+    namespace=os.getenv("METRICS_NAMESPACE", "DataPipeline/Lambda"),
+    function_name=os.getenv("AWS_LAMBDA_FUNCTION_NAME", "local"),
+)
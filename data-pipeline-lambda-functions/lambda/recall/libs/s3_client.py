@@ -1,13 +1,27 @@
-import boto3
+import json
 from datetime import datetime
 from config import Config
 from logger import logger
+from run_metrics import run_metrics
+from s3_uploader import S3Uploader, UploadSettings
+from startup import startup
 import re
 import os
 
 class S3Client:
     def __init__(self):
-        self.client = boto3.client('s3')
+        # One client per container, shared by every region and warm invocation
+        self.client = run_metrics.track_aws_calls(startup.client('s3'))
+        # Date prefix -> set of keys already in S3, filled lazily by one listing per prefix
+        self._existing_keys = {}
+        self._indexed_prefixes = set()
+        self.uploader = S3Uploader(self.client, UploadSettings(
+            multipart_threshold=Config.S3_MULTIPART_THRESHOLD,
+            part_size=Config.S3_PART_SIZE,
+            max_concurrency=Config.S3_UPLOAD_CONCURRENCY,
+            max_in_flight_parts=Config.S3_MAX_IN_FLIGHT_PARTS,
+            checksum_algorithm=Config.S3_CHECKSUM_ALGORITHM
+        ), logger=logger)
         
     def get_s3_key(self, filename, region):
         """Generate S3 key with date-based prefix"""
@@ -21,26 +35,77 @@ class S3Client:
         month = date_str[4:6]
         day = date_str[6:8]
 
-        # Extract only the file name, ignoring the directory structure
-        base_filename = os.path.basename(filename)
+        # Extract only the file name, ignoring the directory structure, in the output format
+        base_filename = Config.get_output_filename(os.path.basename(filename))
         
         return f"{Config.S3_BASE_PREFIX}/{region}/{year}/{month}/{day}/{base_filename}"
         
     def file_exists(self, filename, region):
-        """Check if file exists in S3"""
-        try:
-            s3_key = self.get_s3_key(filename, region)
-            self.client.head_object(Bucket=Config.S3_BUCKET, Key=s3_key)
+        """Check if file exists in S3 using the per-prefix existence index"""
+        s3_key = self.get_s3_key(filename, region)
+        if s3_key in self._get_existing_keys(s3_key):
             logger.info(f"File exists in S3: {s3_key}")
             return True
-        except self.client.exceptions.ClientError as e:
-            if e.response['Error']['Code'] == '404':
-                logger.info(f"File does not exist in S3: {s3_key}")
-                return False
-            raise  # Re-raise if it's a different error
+        logger.info(f"File does not exist in S3: {s3_key}")
+        return False
+        
+    def load_cursor(self, region):
+        """Load the SFTP listing high-water mark for a region, or None if there isn't one"""
+        s3_key = f"{Config.S3_STATE_PREFIX}/{region}/sftp_cursor.json"
+        try:
+            response = self.client.get_object(Bucket=Config.S3_BUCKET, Key=s3_key)
+            return json.loads(response['Body'].read())
+        except self.client.exceptions.NoSuchKey:
+            logger.info(f"No SFTP cursor found at {s3_key}")
+            return None
+            
+    def save_cursor(self, region, mtime, filename):
+        """Persist the SFTP listing high-water mark for a region"""
+        s3_key = f"{Config.S3_STATE_PREFIX}/{region}/sftp_cursor.json"
+        cursor = {'mtime': mtime, 'filename': filename}
+        self.client.put_object(Bucket=Config.S3_BUCKET, Key=s3_key, Body=json.dumps(cursor))
+        logger.info(f"Saved SFTP cursor to {s3_key}", extra={'cursor': cursor})
+        
+    def index_region(self, region):
+        """Index every existing key for a region with one listing, e.g. before a backfill"""
+        prefix = f"{Config.S3_BASE_PREFIX}/{region}/"
+        if prefix not in self._indexed_prefixes:
+            self._index_prefix(prefix)
+            
+    def _get_existing_keys(self, s3_key):
+        """Return the keys under s3_key's date prefix, listing it once per client"""
+        prefix = s3_key.rsplit('/', 1)[0] + '/'
+        if prefix not in self._existing_keys and \
+                not any(prefix.startswith(indexed) for indexed in self._indexed_prefixes):
+            self._index_prefix(prefix)
+        return self._existing_keys.setdefault(prefix, set())
+        
+    def _index_prefix(self, prefix):
+        count = 0
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=Config.S3_BUCKET, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                key_prefix = obj['Key'].rsplit('/', 1)[0] + '/'
+                self._existing_keys.setdefault(key_prefix, set()).add(obj['Key'])
+                count += 1
+        self._existing_keys.setdefault(prefix, set())
+        self._indexed_prefixes.add(prefix)
+        logger.info(f"Indexed {count} existing S3 objects under {prefix}")
             
     def upload_file(self, local_path, filename, region):
         """Upload file to S3 with date-based prefix"""
+        return self._upload(local_path, filename, region)
+        
+    def upload_stream(self, chunks, filename, region):
+        """Upload an iterator of byte chunks to S3 with date-based prefix
+
+        Memory stays bounded by the uploader's in-flight parts however large
+        the stream is.
+        """
+        return self._upload(chunks, filename, region)
+        
+    @run_metrics.timed("s3_upload")
+    def _upload(self, source, filename, region):
         try:
             s3_key = self.get_s3_key(filename, region)
 
@@ -50,9 +115,11 @@ class S3Client:
                 return s3_key
 
             # Proceed with upload if it doesn't exist
-            self.client.upload_file(local_path, Config.S3_BUCKET, s3_key)
-            logger.info(f"Uploaded file to S3: {s3_key}")
+            report = self.uploader.upload(source, Config.S3_BUCKET, s3_key)
+            self._get_existing_keys(s3_key).add(s3_key)
+            run_metrics.count("s3_upload_bytes", report.bytes)
+            logger.info(f"Uploaded file to S3: {s3_key}", extra=report.summary())
             return s3_key
         except Exception as e:
             logger.error(f"Error uploading to S3: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,127 @@
+# secrets_cache.py
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List
+
+import boto3
+from botocore.exceptions import ClientError
+
+BATCH_SIZE = 20  # BatchGetSecretValue accepts at most 20 secret ids per call
+
+
+class SecretsCache:
+    """Process-wide cache of Secrets Manager values.
+
+    Values live in memory for ``ttl_seconds``, so warm invocations skip Secrets
+    Manager entirely. Several missing secrets are fetched with one
+    BatchGetSecretValue call. Secrets the batch call cannot return are fetched
+    one by one, so callers see the usual GetSecretValue errors. When the
+    role may not call BatchGetSecretValue, batching is switched off for the
+    rest of the container's life.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, logger: logging.Logger = None):
+        self.ttl_seconds = ttl_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, tuple] = {}  # secret id -> (parsed value, fetched at)
+        self._lock = threading.Lock()
+        self._client = None
+        self._batching = True
+
+    def get(self, secret_id: str) -> dict:
+        """Return one secret as a dict"""
+        return self.get_many([secret_id])[secret_id]
+
+    def get_many(self, secret_ids: Iterable[str]) -> Dict[str, dict]:
+        """Return several secrets as dicts, fetching only missing or expired ones"""
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for secret_id in dict.fromkeys(secret_ids):
+                entry = self._entries.get(secret_id)
+                if entry is not None and now - entry[1] < self.ttl_seconds:
+                    found[secret_id] = entry[0]
+                else:
+                    missing.append(secret_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            fetched = self._fetch(missing)
+            fetched_at = time.monotonic()
+            with self._lock:
+                for secret_id, value in fetched.items():
+                    self._entries[secret_id] = (value, fetched_at)
+            found.update(fetched)
+        # Callers are free to modify what they get back
+        return {secret_id: dict(value) for secret_id, value in found.items()}
+
+    def set_logger(self, logger: logging.Logger) -> None:
+        """Log through ``logger``, the lambda's own, so warnings reach its JSON handler"""
+        self.logger = logger
+
+    def invalidate(self, secret_id: str = None) -> None:
+        """Drop one secret, or all of them, e.g. after a credential rotation"""
+        with self._lock:
+            if secret_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(secret_id, None)
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                # A dedicated session keeps client creation safe when threads share the cache
+                self._client = boto3.session.Session().client("secretsmanager")
+            return self._client
+
+    def _fetch(self, secret_ids: List[str]) -> Dict[str, dict]:
+        client = self._get_client()
+        values = {}
+        if len(secret_ids) > 1 and self._batching:
+            for start in range(0, len(secret_ids), BATCH_SIZE):
+                values.update(self._fetch_batch(client, secret_ids[start:start + BATCH_SIZE]))
+        for secret_id in secret_ids:
+            if secret_id not in values:
+                values[secret_id] = self._parse(client.get_secret_value(SecretId=secret_id))
+        return values
+
+    def _fetch_batch(self, client, secret_ids: List[str]) -> Dict[str, dict]:
+        values = {}
+        if not hasattr(client, "batch_get_secret_value"):
+            self.logger.warning("botocore predates BatchGetSecretValue, fetching secrets one by one")
+            self._batching = False
+            return values
+        kwargs = {"SecretIdList": secret_ids}
+        try:
+            while True:
+                response = client.batch_get_secret_value(**kwargs)
+                for secret in response.get("SecretValues", []):
+                    # Requests may name a secret by name or by ARN
+                    for secret_id in (secret.get("Name"), secret.get("ARN")):
+                        if secret_id in secret_ids:
+                            values[secret_id] = self._parse(secret)
+                if not response.get("NextToken"):
+                    return values
+                kwargs["NextToken"] = response["NextToken"]
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") != "AccessDeniedException":
+                raise
+            self.logger.warning("BatchGetSecretValue is not allowed, fetching secrets one by one: %s", error)
+            self._batching = False
+            return values
+
+    @staticmethod
+    def _parse(response: dict) -> dict:
+        if "SecretString" in response:
+            return json.loads(response["SecretString"])
+        return json.loads(response["SecretBinary"])
+
+
+# Shared by every client in this container, so it survives warm starts
+secrets_cache = SecretsCache(float(os.getenv("SECRETS_CACHE_TTL_SECONDS", "300")))
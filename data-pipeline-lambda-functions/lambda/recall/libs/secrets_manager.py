@@ -1,16 +1,25 @@
-import boto3
-import json
 from logger import logger
+from secrets_cache import secrets_cache
+
+secrets_cache.set_logger(logger)
 
 class SecretsManager:
     def __init__(self):
-        self.client = boto3.client('secretsmanager')
+        # Secrets are cached process-wide, so warm invocations skip Secrets Manager
+        self.cache = secrets_cache
+    
+    def prefetch(self, secret_names):
+        """Fetch several secrets in one batched call ahead of use"""
+        try:
+            self.cache.get_many(secret_names)
+        except Exception as e:
+            # Each lookup retries on its own and reports its own error
+            logger.warning(f"Error prefetching secrets: {str(e)}")
         
     def get_credentials(self, secret_name):
         """Retrieve SFTP credentials from AWS Secrets Manager"""
         try:
-            response = self.client.get_secret_value(SecretId=secret_name)
-            secret = json.loads(response['SecretString'])
+            secret = self.cache.get(secret_name)
             return {
                 'username': secret['sftp_username'],
                 'password': secret['sftp_password'],
@@ -18,4 +27,4 @@ class SecretsManager:
             }
         except Exception as e:
             logger.error(f"Error fetching secret: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -1,108 +1,241 @@
 # sftp_client.py
+import heapq
+import io
 import pysftp
-import subprocess
+import paramiko
 import os
 import re
 from datetime import datetime
 from typing import Optional, List
 from config import Config
+from host_key_cache import host_key_cache
 from logger import logger
+from run_metrics import run_metrics
+
+# Largest read paramiko issues in a single SFTP request
+_SFTP_BLOCK_SIZE = 32768
+
+# Open connections are kept at module scope, keyed by (host, port, username, session),
+# so warm Lambda invocations reuse an authenticated transport
+_connection_cache = {}
 
 class SFTPClient:
-    def __init__(self, host, username, password, port=22):
+    def __init__(self, host, username, password, port=22, session_id=0):
         self.host = host
         self.username = username
         self.password = password
         self.port = port
+        self.session_id = session_id
         self.cnopts = None
+        self._connection = None
         
-    def setup_connection(self):
-        """Setup SFTP connection with host key verification"""
-        rsa_key = self._get_rsa_key()
-        if not rsa_key:
-            raise Exception("Failed to retrieve RSA key")
+    def new_session(self, session_id):
+        """Return a client for the same server with its own cached connection"""
+        client = SFTPClient(self.host, self.username, self.password, self.port, session_id)
+        client.cnopts = self.cnopts
+        return client
         
-        host_key_path = self._save_host_key_to_file(rsa_key)
+    def setup_connection(self, refresh_host_key=False):
+        """Setup SFTP connection with host key verification"""
+        host_key_path = host_key_cache.get_known_hosts(self.host, refresh=refresh_host_key)
         self.cnopts = pysftp.CnOpts(knownhosts=host_key_path)
         
-    def _get_rsa_key(self):
-        """Retrieve RSA key using ssh-keyscan"""
+    def connect(self):
+        """Return the session connection, reusing a live cached one when possible"""
+        if self._connection is not None:
+            return self._connection
+        
+        key = self._cache_key()
+        connection = _connection_cache.get(key)
+        if connection is not None:
+            if self._is_alive(connection):
+                logger.info(f"Reusing SFTP connection to {self.host} as {self.username}")
+                self._connection = connection
+                return connection
+            logger.info(f"Cached SFTP connection to {self.host} is no longer alive, reconnecting")
+            self.close()
+        
         try:
-            result = subprocess.run(['ssh-keyscan', '-t', 'rsa', self.host],
-                                  capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"ssh-keyscan failed: {result.stderr}")
-                return None
+            try:
+                connection = self._open_connection()
+            except paramiko.AuthenticationException:
+                raise
+            except paramiko.SSHException as e:
+                # Missing or changed host key: refresh the cached key once and retry
+                logger.warning(f"Host key verification failed for {self.host}, refreshing host key: {str(e)}")
+                self.setup_connection(refresh_host_key=True)
+                connection = self._open_connection()
+        except Exception as e:
+            logger.error(f"Error connecting to SFTP server {self.host}: {str(e)}")
+            raise
+        _connection_cache[key] = connection
+        self._connection = connection
+        logger.info(f"Opened SFTP connection to {self.host} as {self.username}")
+        return connection
+        
+    @run_metrics.timed("sftp_connect")
+    def _open_connection(self):
+        return pysftp.Connection(
+            host=self.host,
+            username=self.username,
+            password=self.password,
+            port=self.port,
+            cnopts=self.cnopts
+        )
+        
+    def close(self):
+        """Close the session connection and drop it from the cache"""
+        self._connection = None
+        connection = _connection_cache.pop(self._cache_key(), None)
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.warning(f"Error closing SFTP connection to {self.host}: {str(e)}")
                 
-            for line in result.stdout.splitlines():
-                if 'ssh-rsa' in line:
-                    return line.split('ssh-rsa ')[1]
+    def _cache_key(self):
+        return (self.host, self.port, self.username, self.session_id)
+        
+    @staticmethod
+    def _is_alive(connection):
+        """Health check: transport is active and the server answers a round trip"""
+        try:
+            sftp = connection.sftp_client
+            if not sftp.get_channel().get_transport().is_active():
+                return False
+            sftp.normalize('.')
+            return True
+        except Exception:
+            return False
             
+    def get_latest_file(self, cursor=None):
+        """Get the latest file from SFTP server, ignoring entries at or before cursor"""
+        new_files = self.get_new_files(cursor, limit=1)
+        if not new_files:
             return None
+        
+        # Return the full path of the latest file
+        full_path = f"{Config.SFTP_PATH}/{new_files[0].filename}"
+        logger.info(f"Latest file found: {new_files[0].filename}")
+        return full_path
+        
+    @run_metrics.timed("sftp_list")
+    def get_new_files(self, cursor=None, limit=1):
+        """Return up to limit newest entries newer than cursor, newest first
+
+        ``cursor`` is the ``{'mtime', 'filename'}`` high-water mark of the last
+        processed file. Entries are streamed from the server and only the top
+        ``limit`` are kept in a heap, so the full listing is never sorted.
+        """
+        try:
+            sftp = self.connect().sftp_client
+            high_water_mark = (cursor['mtime'], cursor['filename']) if cursor else None
+            entries = (f for f in sftp.listdir_iter(Config.SFTP_PATH)
+                       if high_water_mark is None or (f.st_mtime, f.filename) > high_water_mark)
+            new_files = heapq.nlargest(limit, entries, key=lambda f: (f.st_mtime, f.filename))
+            logger.info(f"Listed SFTP directory: {Config.SFTP_PATH}", 
+                       extra={'cursor': cursor, 'new_files': len(new_files)})
+            
+            if not new_files:
+                logger.info("No new files found in SFTP directory")
+            return new_files
+                
         except Exception as e:
-            logger.error(f"Error getting RSA key: {str(e)}")
+            logger.error(f"Error getting latest file: {str(e)}")
+            self.close()
             raise
             
-    def _save_host_key_to_file(self, rsa_key):
-        """Save host key to known_hosts file"""
+    @run_metrics.timed("sftp_list")
+    def list_files(self, pattern):
+        """List the files in the SFTP directory whose names fully match pattern"""
         try:
-            host_key_path = '/tmp/known_hosts'
-            with open(host_key_path, 'w') as f:
-                f.write(f"{self.host} ssh-rsa {rsa_key}")
-            os.chmod(host_key_path, 0o644)
-            return host_key_path
+            regex = re.compile(pattern)
+            files = [f for f in self.connect().listdir_attr(Config.SFTP_PATH) if regex.fullmatch(f.filename)]
+            logger.info(f"Found {len(files)} files matching {pattern} in {Config.SFTP_PATH}")
+            return files
         except Exception as e:
-            logger.error(f"Error saving host key: {str(e)}")
+            logger.error(f"Error listing files: {str(e)}")
+            self.close()
             raise
             
-    def get_latest_file(self):
-        """Get the latest file from SFTP server"""
+    def stat(self, remote_path):
+        """Stat a remote file over the session connection"""
         try:
-            with pysftp.Connection(
-                host=self.host,
-                username=self.username,
-                password=self.password,
-                port=self.port,
-                cnopts=self.cnopts
-            ) as sftp:
-                sftp.cwd(Config.SFTP_PATH)
-                logger.info(f"Changed to SFTP directory: {Config.SFTP_PATH}")
-                files = sftp.listdir_attr()
-                
-                if not files:
-                    logger.info("No files found in SFTP directory")
-                    return None
-                    
-                # Sort files by modification time
-                files.sort(key=lambda x: x.st_mtime, reverse=True)
-                latest_file = files[0].filename
-                
-                # Return the full path of the latest file
-                full_path = f"{Config.SFTP_PATH}/{latest_file}"
-                logger.info(f"Latest file found: {latest_file}")
-                return full_path
-                
+            return self.connect().stat(remote_path)
         except Exception as e:
-            logger.error(f"Error getting latest file: {str(e)}")
+            logger.error(f"Error getting file attributes for {remote_path}: {str(e)}")
+            self.close()
+            raise
+            
+    def iter_file(self, remote_path, window_size=None):
+        """Yield the remote file's bytes, keeping at most one read-ahead window in flight"""
+        window_size = window_size or Config.SFTP_READ_WINDOW
+        try:
+            sftp = self.connect()
+            file_size = sftp.stat(remote_path).st_size
+            logger.info(f"Streaming {remote_path} ({file_size} bytes)")
+            with sftp.open(remote_path, 'rb') as remote_file:
+                offset = 0
+                while offset < file_size:
+                    end = min(offset + window_size, file_size)
+                    # readv pipelines the requests for this window only
+                    blocks = [(start, min(_SFTP_BLOCK_SIZE, end - start))
+                              for start in range(offset, end, _SFTP_BLOCK_SIZE)]
+                    for data in remote_file.readv(blocks):
+                        run_metrics.count("sftp_download_bytes", len(data))
+                        yield data
+                    offset = end
+        except Exception as e:
+            logger.error(f"Error streaming file from {remote_path}: {str(e)}")
+            self.close()
             raise
             
+    def open_stream(self, remote_path, window_size=None):
+        """Open the remote file as a buffered, read-only binary stream"""
+        return io.BufferedReader(_IterableReader(self.iter_file(remote_path, window_size)),
+                                 buffer_size=_SFTP_BLOCK_SIZE * 8)
+        
+    @run_metrics.timed("sftp_download")
     def download_file(self, remote_path, local_path):
         """Download file from SFTP server"""
         try:
             logger.info(f"Attempting to download from {remote_path} to {local_path}")
-            with pysftp.Connection(
-                host=self.host,
-                username=self.username,
-                password=self.password,
-                port=self.port,
-                cnopts=self.cnopts
-            ) as sftp:
-                sftp.get(remote_path, local_path)
-                logger.info(f"Downloaded file: {remote_path}")
+            sftp = self.connect()
+            file_size = sftp.stat(remote_path).st_size
+            sftp.get(remote_path, local_path)
+            run_metrics.count("sftp_download_bytes", file_size)
+            logger.info(f"Downloaded file: {remote_path} ({file_size} bytes)")
         except IOError as e:
             logger.error(f"File not found: {remote_path}")
             return  # Handle error appropriately
         except Exception as e:
             logger.error(f"Error downloading file from {remote_path} to {local_path}: {str(e)}")
-            raise
\ No newline at end of file
+            self.close()
+            raise
+
+
+class _IterableReader(io.RawIOBase):
+    """Raw binary stream over an iterator of byte chunks"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._pending = memoryview(b'')
+        
+    def readable(self):
+        return True
+        
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+        
+    def close(self):
+        if not self.closed and hasattr(self._chunks, 'close'):
+            self._chunks.close()
+        super().close()
@@ -0,0 +1,87 @@
+# startup.py
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+# Taken when the handler module starts importing, since it imports this module first
+_IMPORT_STARTED = time.perf_counter()
+
+
+class Startup:
+    """Per-container startup layer
+
+    Creates shared clients once per container, imports heavy modules on first
+    use and times both, so each invocation can report what it paid for.
+    Everything held here survives warm starts.
+    """
+
+    def __init__(self):
+        self.init_seconds = None
+        self._cold = True
+        self._timings: Dict[str, float] = {}
+        self._resources: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def mark_initialized(self) -> None:
+        """Record how long the handler module took to import"""
+        if self.init_seconds is None:
+            self.init_seconds = time.perf_counter() - _IMPORT_STARTED
+            self._record("init.handler_import", self.init_seconds)
+
+    def resource(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the container-wide object called ``name``, creating it on first use"""
+        with self._lock:
+            if name not in self._resources:
+                with self.timed(f"init.{name}"):
+                    self._resources[name] = factory()
+            return self._resources[name]
+
+    def client(self, service_name: str) -> Any:
+        """Return a boto3 client shared by every thread in this container"""
+        def create():
+            boto3 = self.load("boto3")
+            # A dedicated session keeps client creation safe when threads share clients
+            return boto3.session.Session().client(service_name)
+        return self.resource(f"boto3.{service_name}", create)
+
+    def load(self, module_name: str) -> Any:
+        """Import a module on first use and record how long the import took"""
+        module = sys.modules.get(module_name)
+        if module is None:
+            with self._lock, self.timed(f"import.{module_name}"):
+                module = importlib.import_module(module_name)
+        return module
+
+    @contextmanager
+    def timed(self, phase: str):
+        """Add the time spent in the block to ``phase``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(phase, time.perf_counter() - started)
+
+    def report(self) -> dict:
+        """Summarise this invocation and reset the per-invocation timings"""
+        with self._lock:
+            report = {
+                "cold_start": self._cold,
+                "init_seconds": round(self.init_seconds or 0.0, 4) if self._cold else 0.0,
+                "startup_timings": {
+                    phase: round(seconds, 4) for phase, seconds in self._timings.items()
+                },
+            }
+            self._cold = False
+            self._timings = {}
+        return report
+
+    def _record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self._timings[phase] = self._timings.get(phase, 0.0) + seconds
+
+
+# Shared by every module in this container
+startup = Startup()
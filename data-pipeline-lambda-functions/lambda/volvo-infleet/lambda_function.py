@@ -3,24 +3,40 @@ This module provides functionality for managing secrets and configurations
 for the Volvo InFleet service integration.
 """
 
+# Imported first so the handler's import time is measured from here
+from libs.startup import startup
+
 import os
 import sys
 
 import boto3
 import json
+import pandas as pd
 from botocore.exceptions import ClientError
 
 from datetime import datetime, timedelta, timezone
-from io import BytesIO
 from pathlib import Path
-import asyncio
 
 from libs.api_client import LoanerClient, OrderClient
+from libs.output_encoder import encode_frames, iter_row_chunks, output_extension
+from libs.run_metrics import run_metrics
+from libs.s3_uploader import S3Uploader, UploadSettings
+from libs.sync_state import SyncCheckpoint
+from libs.vin_cache import InServiceDateCache
 from libs.volvo_infleet_service import VolvoInfleetService
-from libs.structured_logging import StructuredLoggerBuilder
+from libs.structured_logging import StructuredLoggerBuilder, flush_logs
 
 CURRENT_TIME = datetime.now(timezone.utc)
+# Parquet column types; columns not listed are written as strings
+PARQUET_SCHEMA = {"last_modified_date": "timestamp"}
+# Rows encoded at a time when streaming the payload to S3
+OUTPUT_CHUNK_ROWS = int(os.getenv("OUTPUT_CHUNK_ROWS", "50000"))
+# Loaners last modified longer ago than this are neither fetched nor kept pending
+LOOKBACK = timedelta(days=360)
+# Furthest back the checkpoint is held for loaners whose Order API lookups ran out of retries
+SYNC_MAX_HOLD = timedelta(hours=float(os.getenv("SYNC_MAX_HOLD_HOURS", "24")))
 logger = StructuredLoggerBuilder("OEM_Infleeter").build()
+startup.mark_initialized()
 
 def parse_sync_date(sync_date: str) -> datetime:
     """
@@ -50,7 +66,7 @@ def calculate_last_sync_date() -> str:
              formatted as "YYYY-MM-DDTHH:MM:SS.000Z".
     """
     logger.info("Calculating last sync date from current time: %s", CURRENT_TIME)
-    start_time = CURRENT_TIME - timedelta(days=360)
+    start_time = CURRENT_TIME - LOOKBACK
     last_sync_date = start_time.replace(
         hour=0, minute=0, second=0, microsecond=0
     ).strftime("%Y-%m-%dT%H:%M:%S.000Z")
@@ -63,13 +79,15 @@ def load_environment_variables() -> dict:
     Loads environment variables necessary for the application.
 
     :return: A dictionary containing the environment ('env'), S3 bucket name ('lz_bucket'),
-    and target directory ('target_dir'). Defaults are used if environment variables are not set.
+    target directory ('target_dir') and output format ('output_format'). Defaults are used
+    if environment variables are not set.
     """
     logger.info("Loading environment variables.")
     env_vars = {
         "env": os.getenv("ENV", "tst"),
         "lz_bucket": os.getenv("LZ_BUCKET", "unknown"),
         "target_dir": os.getenv("TARGET_DIR", "unknown"),
+        "output_format": os.getenv("OUTPUT_FORMAT", "csv"),
     }
     logger.debug("Loaded environment variables: %s", env_vars)
     return env_vars
@@ -95,9 +113,64 @@ def get_secret(secret_name: str) -> dict:
         raise
 
 
+def hold_checkpoint(max_last_modified, loaners_df, exhausted_vins) -> datetime:
+    """
+    Picks the checkpoint to save after a delivered run.
+
+    Loaners whose Order API lookups ran out of retries on transient errors are
+    fetched again on the next run by stopping just before the earliest of them,
+    but the checkpoint is never held more than SYNC_MAX_HOLD in the past.
+    Permanent failures are not held for, so one bad VIN cannot pin the checkpoint.
+
+    :param max_last_modified: The newest lastModifiedDate fetched in this run.
+    :param loaners_df: The loaners fetched in this run.
+    :param exhausted_vins: VINs whose lookups ran out of retries.
+    :return: The checkpoint as a datetime.
+    """
+    checkpoint = max_last_modified.to_pydatetime()
+    if not exhausted_vins:
+        return checkpoint
+
+    exhausted = loaners_df["vin"].isin(exhausted_vins)
+    if not exhausted.any():
+        return checkpoint  # only pending loaners ran out of retries; they stay pending
+    earliest = loaners_df.loc[exhausted, "lastModifiedDate"].min().to_pydatetime()
+    held = max(earliest - timedelta(milliseconds=1), CURRENT_TIME - SYNC_MAX_HOLD)
+    if held < checkpoint:
+        checkpoint = held
+        logger.warning(
+            "Holding sync checkpoint at %s: %d VINs ran out of Order API retries",
+            checkpoint.isoformat(), len(exhausted_vins),
+        )
+    return checkpoint
+
+
+def undelivered_loaners(loaners_df, order_client, checkpoint):
+    """
+    Picks the loaners to keep pending for later runs.
+
+    These are the loaners dropped for want of a handover date and those whose
+    lookups failed, except loaners newer than ``checkpoint``, which the next run
+    fetches again anyway. The VIN cache keeps negative results for
+    VIN_CACHE_NEGATIVE_TTL_HOURS, so pending VINs only reach the Order API again
+    once that has expired.
+
+    :param loaners_df: The loaners enriched in this run, fresh and pending.
+    :param order_client: The OrderClient that enriched them.
+    :param checkpoint: The checkpoint being saved, or None if it is not moving.
+    :return: DataFrame of the loaner records to keep pending.
+    """
+    undelivered = loaners_df["vin"].isin(order_client.dropped_vins + order_client.failed_vins)
+    if checkpoint is not None:
+        undelivered &= loaners_df["lastModifiedDate"] <= checkpoint
+    return loaners_df[undelivered]
+
+
+@run_metrics.timed("s3_upload")
 def payload_to_s3(inv_df):
     """
-    Saves the DataFrame to a CSV file in an S3 bucket with a timestamp in the filename.
+    Saves the DataFrame to an S3 bucket with a timestamp in the filename, as CSV,
+    gzip-compressed CSV or Parquet depending on the OUTPUT_FORMAT environment variable.
 
     :param inv_df: Pandas DataFrame to save
     :return: Dictionary with statusCode and message
@@ -113,21 +186,24 @@ def payload_to_s3(inv_df):
         day = CURRENT_TIME.strftime('%d')
         time = CURRENT_TIME.strftime('%H%M%S')
 
-        # Construct the S3 path
-        s3_key = f"{target_dir}{year}/{month}/{day}/volvo_inventories_{time}.csv"
+        output_format = env_vars["output_format"]
+        extension = output_extension(output_format)
 
-        # Convert DataFrame to CSV in memory
-        csv_buffer = BytesIO()
-        inv_df.to_csv(csv_buffer, index=False)
-        csv_buffer.seek(0)
+        # Construct the S3 path
+        s3_key = f"{target_dir}{year}/{month}/{day}/volvo_inventories_{time}{extension}"
 
-        s3_client = boto3.client("s3")
-        s3_client.put_object(
-            Bucket=bucket_name, Key=s3_key, Body=csv_buffer.getvalue()
+        # Encode the DataFrame in row chunks straight into the (multipart) upload,
+        # so only a chunk and the parts in flight are ever held as bytes
+        payload = encode_frames(
+            iter_row_chunks(inv_df, OUTPUT_CHUNK_ROWS), output_format, schema=PARQUET_SCHEMA
         )
 
+        uploader = S3Uploader(startup.client("s3"), UploadSettings.from_env(), logger=logger)
+        report = uploader.upload(payload, bucket_name, s3_key)
+        run_metrics.count("s3_upload_bytes", report.bytes)
+
         s3_url = f"s3://{bucket_name}/{s3_key}"
-        logger.info("Inventory Items saved to %s", s3_url)
+        logger.info("Inventory Items saved to %s", s3_url, extra=report.summary())
         return {
             "statusCode": 200,
             "body": f"Inventory Items successfully saved to {s3_url}",
@@ -148,21 +224,29 @@ def lambda_handler(event, context):
     :param event: AWS Lambda event object
     :param context: AWS Lambda context object
     """
+    run_metrics.begin()
+    # Every S3 user shares this client, so one registration counts all their calls
+    run_metrics.track_aws_calls(startup.client("s3"))
     env_vars = load_environment_variables()
     env = env_vars["env"]
 
     sync_date = event.get("sync_date", None)
     last_sync = None
+    checkpoint = SyncCheckpoint.from_env(env_vars)
 
     try:
         logger.info(
             "OEM Auto-fleeter Started on env %s at : %s", env.upper(), CURRENT_TIME
         )
 
+        # Loaded even for a given sync_date, which keeps the pending loaners
+        saved_sync = checkpoint.load()
         if sync_date:
             last_sync = parse_sync_date(sync_date).isoformat()
         else:
-            last_sync = calculate_last_sync_date()
+            # Fetch only the delta since the last delivered loaner, falling back
+            # to the full lookback window when no checkpoint exists yet
+            last_sync = saved_sync or calculate_last_sync_date()
 
         logger.info("Last sync date: %s", last_sync)
     except ValueError as e:
@@ -196,26 +280,69 @@ def lambda_handler(event, context):
         loaner_client = LoanerClient()
         lnr_token = loaner_client.parse_token(configs=None)
         loaners_df = loaner_client._get_loaners(lnr_token, last_sync)
-        
-        if loaners_df is None:
+        # Loaners from earlier runs still waiting for a handover date
+        pending_df = checkpoint.pending_loaners(since=CURRENT_TIME - LOOKBACK)
+
+        if loaners_df is None and pending_df is None:
             logger.debug(
                 "Exiting Since No-Loaners found Since LastSyncDate, %s", last_sync
             )
+            if checkpoint.pending:
+                checkpoint.save(None)  # every pending loaner left the lookback window
             return {
                 "statusCode": 200,
                 "body": f"Terminated : No-Loaners found Since LastSyncDate {last_sync}",
             }
 
+        if pending_df is None:
+            enrich_df = loaners_df
+        else:
+            logger.info("Re-enriching %d pending loaners", len(pending_df))
+            # A freshly fetched record replaces the pending one for the same VIN
+            enrich_df = LoanerClient._latest_per_vin(pd.concat([pending_df, loaners_df], ignore_index=True))
+
+        vin_cache = InServiceDateCache.from_env(env_vars)
+        vin_cache.load()
+
         order_client = OrderClient()
         odr_token = order_client.parse_token(configs=None)
-        inv_df = asyncio.run(order_client._get_inservice_dates(odr_token, loaners_df))
+        # Run on the shared transport's event loop so its pooled connections are reused
+        inv_df = order_client.transport.run(
+            order_client._get_inservice_dates(odr_token, enrich_df, cache=vin_cache)
+        )
+        vin_cache.save()
+        run_metrics.count("rows_out", len(inv_df))
 
-        logger.info("Processing complete, saving results to S3.")
-        return payload_to_s3(inv_df)
+        if loaners_df is None and inv_df.empty:
+            # Only pending loaners, none of them ready yet: nothing to deliver
+            result = {
+                "statusCode": 200,
+                "body": f"Terminated : No-Loaners ready Since LastSyncDate {last_sync}",
+            }
+        else:
+            logger.info("Processing complete, saving results to S3.")
+            result = payload_to_s3(inv_df)
+
+        # Only advance the checkpoint once the delta has landed in S3
+        if result["statusCode"] == 200:
+            new_checkpoint = None
+            if loaners_df is not None:
+                new_checkpoint = hold_checkpoint(
+                    loaners_df["lastModifiedDate"].max(), loaners_df, order_client.exhausted_vins
+                )
+            still_pending = undelivered_loaners(enrich_df, order_client, new_checkpoint)
+            run_metrics.count("vins_pending", len(still_pending))
+            checkpoint.save(new_checkpoint, still_pending)
+        return result
     except Exception as e:
         logger.error("Error in Lambda handler: %s", e)
         return {
             "statusCode": 500,
             "body": f"Internal server error: {str(e)}",
         }
+    finally:
+        # One record per run; its _aws block makes CloudWatch publish the figures as metrics
+        logger.info("Run summary", extra=run_metrics.summary(startup.report()))
+        # Logs are written in the background; the container is frozen once this returns
+        flush_logs(logger)
     
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+This module provides an adaptive, rate-limit-aware scheduler for concurrent API requests.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger("OEM_Infleeter")
+
+
+class RetryableError(Exception):
+    """Raised by a scheduled request that may succeed if retried later."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header value.
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class SchedulerStats:
+    """Counters describing one scheduler run."""
+
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    final_concurrency: float = 0.0
+    failures: Dict[Any, str] = field(default_factory=dict)
+    # Failed items that used up their retries on retryable errors, as opposed to final errors
+    exhausted: Set[Any] = field(default_factory=set)
+
+
+class AdaptiveScheduler:
+    """
+    Keeps a steady number of requests in flight and adapts it with AIMD.
+
+    The concurrency limit grows by about one request per round trip while
+    latency stays near the best latency seen. It is halved on a 429, a 5xx or
+    a latency spike, at most once per round trip. A Retry-After header pauses
+    all dispatching. Retryable failures are re-queued with full-jitter
+    exponential backoff, up to ``max_retries`` times.
+    """
+
+    def __init__(self, initial_concurrency: int = 20, min_concurrency: int = 1,
+                 max_concurrency: int = 100, max_retries: int = 5, base_backoff: float = 0.5,
+                 max_backoff: float = 30.0, latency_tolerance: float = 3.0):
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.latency_tolerance = latency_tolerance
+        self._best_latency = None
+        self._smoothed_latency = None
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+
+    async def run(self, items: Iterable[Any], request: Callable[[Any], Awaitable[Any]],
+                  on_result: Optional[Callable[[Any, Any], None]] = None) -> SchedulerStats:
+        """
+        Runs ``request`` for every item.
+
+        Args:
+            items (Iterable): Items to process, consumed lazily.
+            request (Callable): Coroutine function called with one item. It raises
+                RetryableError for transient failures; any other exception is final.
+            on_result (Callable): Optional, called with (item, result) for each success.
+                Items must be hashable; failed items are keyed by item in the stats.
+
+        Returns:
+            SchedulerStats: Success, failure, retry and throttling counts.
+        """
+        loop = asyncio.get_running_loop()
+        stats = SchedulerStats()
+        pending = iter(items)
+        ready = []
+        delayed = []  # heap of (ready_at, sequence, item, attempt)
+        sequence = itertools.count()
+        in_flight = {}
+
+        while True:
+            now = loop.time()
+            while delayed and delayed[0][0] <= now:
+                _, _, item, attempt = heapq.heappop(delayed)
+                ready.append((item, attempt))
+
+            while len(in_flight) < int(self.limit) and now >= self._paused_until:
+                if ready:
+                    item, attempt = ready.pop()
+                else:
+                    item = next(pending, _EXHAUSTED)
+                    if item is _EXHAUSTED:
+                        break
+                    attempt = 0
+                task = asyncio.ensure_future(self._timed(request, item))
+                in_flight[task] = (item, attempt)
+
+            if not in_flight and not ready and not delayed:
+                break
+
+            wake_at = [t for t in (delayed[0][0] if delayed else None,
+                                   self._paused_until if self._paused_until > now else None) if t]
+            timeout = max(0.0, min(wake_at) - now) if wake_at else None
+            if not in_flight:
+                await asyncio.sleep(timeout or 0)
+                continue
+            done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                item, attempt = in_flight.pop(task)
+                error, result, latency = task.result()
+                if error is None:
+                    self._on_success(latency, loop.time())
+                    stats.succeeded += 1
+                    if on_result is not None:
+                        on_result(item, result)
+                elif isinstance(error, RetryableError):
+                    self._on_retryable(error, latency, loop.time(), stats)
+                    if attempt < self.max_retries:
+                        stats.retries += 1
+                        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                        if error.retry_after is not None:
+                            delay = max(delay, error.retry_after)
+                        heapq.heappush(delayed, (loop.time() + delay, next(sequence), item, attempt + 1))
+                    else:
+                        stats.failed += 1
+                        stats.failures[item] = str(error)
+                        stats.exhausted.add(item)
+                else:
+                    stats.failed += 1
+                    stats.failures[item] = str(error)
+
+        stats.final_concurrency = self.limit
+        return stats
+
+    @staticmethod
+    async def _timed(request, item):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            return None, await request(item), loop.time() - started
+        except Exception as err:
+            return err, None, loop.time() - started
+
+    def _on_success(self, latency: float, now: float) -> None:
+        self._smoothed_latency = (
+            latency if self._smoothed_latency is None else 0.8 * self._smoothed_latency + 0.2 * latency
+        )
+        # The baseline is the lowest smoothed latency, not the fastest single reply:
+        # one lucky response would otherwise make every normal one look like a spike
+        self._best_latency = (
+            self._smoothed_latency if self._best_latency is None
+            else min(self._best_latency, self._smoothed_latency)
+        )
+        if self._smoothed_latency > self._best_latency * self.latency_tolerance:
+            self._decrease(now)
+        else:
+            # Additive increase: roughly +1 per full window of successful requests
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+
+    def _on_retryable(self, error: RetryableError, latency: float, now: float,
+                      stats: SchedulerStats) -> None:
+        if error.status == 429:
+            stats.throttled += 1
+        elif error.status is not None and error.status >= 500:
+            stats.server_errors += 1
+        if error.retry_after is not None:
+            self._paused_until = max(self._paused_until, now + error.retry_after)
+        self._decrease(now, latency)
+
+    def _decrease(self, now: float, latency: float = 0.0) -> None:
+        # Multiplicative decrease, at most once per round trip. Before any success
+        # the failed request's own latency stands in for the round trip, so a
+        # first burst of 429s halves the limit once rather than once per reply.
+        round_trip = self._smoothed_latency if self._smoothed_latency is not None else latency
+        if now - self._last_decrease < round_trip:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit / 2)
+
+
+_EXHAUSTED = object()
@@ -3,60 +3,123 @@ This module provides API client classes for interacting with the Volvo InFleet s
 """
 
 import asyncio
+import codecs
+import itertools
+import json
 import logging
 import os
 
+import httpx
+import numpy as np
 import pandas as pd
-import requests
-import aiohttp
 
-from requests.adapters import HTTPAdapter
-from requests.exceptions import HTTPError, RequestException
+from libs.adaptive_scheduler import AdaptiveScheduler, RetryableError, parse_retry_after
+from libs.http_transport import HttpTransport
+from libs.run_metrics import run_metrics
 from libs.secrets_manager import SecretsManager
-from typing import Dict
-from urllib3.util import Retry
-
-TIMEOUT = 60
+from libs.startup import startup
+from libs.token_manager import TokenManager
+from libs.vin_cache import InServiceDateCache
+from typing import Any, Dict, List, Optional
+
+STREAM_CHUNK_SIZE = 64 * 1024
+LOANER_BATCH_SIZE = int(os.getenv("LOANER_BATCH_SIZE", "5000"))
+ORDER_API_INITIAL_CONCURRENCY = int(os.getenv("ORDER_API_INITIAL_CONCURRENCY", "20"))
+ORDER_API_MAX_CONCURRENCY = int(os.getenv("ORDER_API_MAX_CONCURRENCY", "100"))
+# Per-VIN outcomes are logged as counts plus at most this many example VINs
+LOG_VIN_SAMPLE_SIZE = int(os.getenv("LOG_VIN_SAMPLE_SIZE", "20"))
 
 logger = logging.getLogger("OEM_Infleeter")
 
 
+class _JsonArrayParser:
+    """
+    Incrementally parses a JSON array of objects fed as byte chunks.
+
+    Each call to ``feed`` returns the elements completed by that chunk; ``close``
+    checks that the whole array was received.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._started = self._finished = self._not_array = False
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        """
+        Parses the next chunk of the response body.
+
+        Args:
+            chunk (bytes): The next piece of the body.
+
+        Returns:
+            list: The array elements fully received so far and not returned before.
+        """
+        self._buffer += self._utf8.decode(chunk)
+        if self._not_array:
+            return []
+        items = []
+        buffer = self._buffer
+        pos = 0
+        while not self._finished:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not self._started:
+                if buffer[pos] != "[":
+                    self._not_array = True  # parsed whole once fully received
+                    return items
+                self._started = True
+                pos += 1
+            elif buffer[pos] == "]":
+                self._finished = True
+            else:
+                try:
+                    item, pos = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # element not fully received yet
+                items.append(item)
+        self._buffer = buffer[pos:]
+        return items
+
+    def close(self) -> None:
+        """Checks the body once it has been fully received."""
+        self._buffer += self._utf8.decode(b"", final=True)
+        if self._not_array:
+            # An empty body such as null or {} means no loaners; anything else is unexpected
+            if json.loads(self._buffer):
+                raise ValueError("Expected a JSON array from the Loaner API.")
+        elif self._started and not self._finished:
+            raise ValueError("Truncated JSON array from the Loaner API.")
+
+
 class APIClient:
     """Base API client for making HTTP requests."""
 
     def __init__(self):
         logger.info("Initializing API client.")
-        self.session = self._api_session()
-
-    def _api_session(self) -> requests.Session:
-        """Creates a requests session with retry logic."""
-        logger.info("Setting up HTTP session with retry logic.")
-        session = requests.Session()
-        adapter = HTTPAdapter(
-            pool_connections=5,
-            pool_maxsize=10,
-            max_retries=Retry(
-                total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]
-            ),
-        )
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        logger.info("HTTP session created successfully.")
-        return session
+        # Token, loaner and order calls share one transport per container, so
+        # warm invocations reuse its open connections
+        self.transport = startup.resource("http.transport", HttpTransport)
 
-    def _generate_token(self, auth_url: str, secrets: Dict[str, str]) -> str:
-        """Generates an authorization token."""
+    @run_metrics.timed("token_generation")
+    def _generate_token(self, auth_url: str, secrets: Dict[str, str]) -> Dict[str, Any]:
+        """Generates an authorization token and returns the token response."""
         logger.info("Generating authorization token from secrets.")
         secrets["grant_type"] = "client_credentials"
 
         try:
             logger.debug("Requesting token from auth URL: %s", auth_url)
-            response = self.session.get(url=auth_url, data=secrets, timeout=TIMEOUT)
+            response = self.transport.run(
+                self.transport.request("GET", auth_url, data=secrets)
+            )
             response.raise_for_status()
-            token = response.json()["access_token"]
+            token_response = response.json()
             logger.info("Token generated successfully.")
-            return token
-        except requests.exceptions.RequestException as e:
+            return token_response
+        except httpx.HTTPError as e:
             logger.error("Failed to generate token: %s", e)
             raise
 
@@ -69,6 +132,7 @@ class BaseClient(APIClient):
         logger.info("Initializing BaseClient for service: %s", secret_prefix)
         self.configs = None
         self.secrets = self._get_secret(secret_prefix)
+        self.token_manager = self._token_manager(secret_prefix)
 
     def _get_secret(self, secret_prefix: str) -> Dict[str, str]:
         """Retrieves secrets from the secrets manager."""
@@ -90,16 +154,30 @@ class BaseClient(APIClient):
         logger.info("Secrets retrieved successfully for %s.", secret_prefix)
         return secrets
 
-    def parse_token(self, configs):
-        """Parses the token from the given configuration."""
-        logger.info("Parsing token for service.")
-        self.configs = configs
+    def _token_manager(self, secret_prefix: str) -> TokenManager:
+        """Creates the token cache for this service, keyed by service, auth URL and client id."""
         url = self.secrets["auth_url"]  # Use auth_url from secrets manager
         secrets = self.secrets.copy()
         secrets.pop("subscription_key", None)
         secrets.pop("vendor_code", None)
-        logger.debug("Requesting token from URL: %s with secrets", url)
-        return self._generate_token(auth_url=url, secrets=secrets)
+
+        def fetch_token():
+            logger.debug("Requesting token from URL: %s with secrets", url)
+            return self._generate_token(auth_url=url, secrets=secrets)
+
+        client_key = f"{secret_prefix}|{url}|{secrets.get('client_id', '')}"
+        return TokenManager(client_key, fetch_token)
+
+    def parse_token(self, configs):
+        """Returns a cached token for the service, generating one only when needed."""
+        logger.info("Parsing token for service.")
+        self.configs = configs
+        return self.token_manager.get()
+
+    def refresh_token(self, stale_token: str) -> str:
+        """Replaces a token the API rejected with 401, sharing one refresh between callers."""
+        logger.warning("Authorization token rejected, refreshing it.")
+        return self.token_manager.refresh(stale_token)
 
 
 class LoanerClient(BaseClient):
@@ -109,6 +187,7 @@ class LoanerClient(BaseClient):
         logger.info("Initializing LoanerClient.")
         super().__init__("Loaner")
 
+    @run_metrics.timed("loaner_fetch")
     def _get_loaners(self, token: str, last_sync_date: str = None) -> pd.DataFrame:
         """
         Fetches loaner vehicles from the Loaner API, handles possible errors,
@@ -134,17 +213,15 @@ class LoanerClient(BaseClient):
 
         try:
             logger.debug("Sending request to Loaner API with base URL: %s", base_url)
-            response = self.session.get(
-                url=base_url, headers=headers, params=params, timeout=TIMEOUT
+            batch_frames, total_records = self.transport.run(
+                self._stream_loaners(base_url, headers, params, token)
             )
-            response.raise_for_status()
-            logger.info("Loaner vehicles fetched successfully.")
-        except HTTPError as http_err:
+        except httpx.HTTPStatusError as http_err:
             logger.error(
                 "HTTP error occurred while fetching loaner vehicles: %s", http_err
             )
             raise
-        except RequestException as req_err:
+        except httpx.HTTPError as req_err:
             logger.error(
                 "Request error occurred while fetching loaner vehicles: %s", req_err
             )
@@ -155,25 +232,69 @@ class LoanerClient(BaseClient):
             )
             raise
 
-        # Process the response JSON to DataFrame
-        response_json = response.json()
-        if not response_json:
+        if not total_records:
             logger.info("The response from the Loaner API is empty.")
             return None
 
-        loaners_df = pd.DataFrame(response_json)
+        logger.info("Loaner vehicles fetched successfully: %d records.", total_records)
+        run_metrics.count("rows_in", total_records)
 
+        # Identify duplicates across batches and keep the most recent lastModifiedDate
+        unique_loaners = self._latest_per_vin(pd.concat(batch_frames, ignore_index=True))
+
+        logger.info("Identified %d unique loaner vehicles.", len(unique_loaners))
+        
+        return unique_loaners
+
+    async def _stream_loaners(self, base_url: str, headers: Dict[str, str],
+                              params: Dict[str, str], token: str):
+        """
+        Streams the Loaner API response and dedups each batch as it arrives,
+        so the raw payload is never held in memory all at once.
+
+        Returns:
+            tuple: The per-batch DataFrames and the number of records received.
+        """
+        for attempt in range(2):
+            async with self.transport.stream(
+                "GET", base_url, headers=headers, params=params
+            ) as response:
+                if response.status_code == 401 and attempt == 0:
+                    # The token may have been revoked or expired early; retry once with a new one
+                    new_token = await asyncio.to_thread(self.refresh_token, token)
+                    headers["Authorization"] = f"Bearer {new_token}"
+                    continue
+                response.raise_for_status()
+                logger.info("Loaner vehicles response received, streaming body.")
+
+                parser = _JsonArrayParser()
+                batch_frames = []
+                total_records = 0
+                batch = []
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    run_metrics.count("loaner_download_bytes", len(chunk))
+                    for record in parser.feed(chunk):
+                        batch.append(record)
+                        if len(batch) >= LOANER_BATCH_SIZE:
+                            batch_frames.append(self._latest_per_vin(pd.DataFrame(batch)))
+                            total_records += len(batch)
+                            batch = []
+                parser.close()
+                if batch:
+                    batch_frames.append(self._latest_per_vin(pd.DataFrame(batch)))
+                    total_records += len(batch)
+                return batch_frames, total_records
+
+    @staticmethod
+    def _latest_per_vin(loaners_df: pd.DataFrame) -> pd.DataFrame:
+        """Keeps the record with the most recent lastModifiedDate for each VIN."""
         # Convert lastModifiedDate to datetime
         loaners_df["lastModifiedDate"] = pd.to_datetime(loaners_df["lastModifiedDate"])
 
         # Identify duplicates by VIN and keep the one with the most recent lastModifiedDate
-        unique_loaners = loaners_df.sort_values("lastModifiedDate").drop_duplicates(
+        return loaners_df.sort_values("lastModifiedDate").drop_duplicates(
             subset="vin", keep="last"
         )
-
-        logger.info("Identified %d unique loaner vehicles.", len(unique_loaners))
-        
-        return unique_loaners
     
 class OrderClient(BaseClient):
     """Client for interacting with the Order service."""
@@ -181,8 +302,15 @@ class OrderClient(BaseClient):
     def __init__(self):
         logger.info("Initializing OrderClient.")
         super().__init__("Order")
-
-    async def _get_inservice_dates(self, token: str, loaners_df: pd.DataFrame) -> pd.DataFrame:
+        # Outcomes of the last enrichment run; these VINs' rows are missing from its result
+        self.dropped_vins = []  # no order or no customerHandoverDate yet
+        self.failed_vins = []  # lookup failed
+        self.exhausted_vins = []  # subset of failed_vins that ran out of retries on transient errors
+
+    @run_metrics.timed("order_enrichment")
+    async def _get_inservice_dates(
+        self, token: str, loaners_df: pd.DataFrame, cache: Optional[InServiceDateCache] = None
+    ) -> pd.DataFrame:
         """
         Fetches in-service dates for loaner vehicles from the Order API and updates the DataFrame.
         Drops records with no customerHandoverDate and logs the process.
@@ -190,9 +318,14 @@ class OrderClient(BaseClient):
         Args:
             token (str): The authorization token for the API request.
             loaners_df (pd.DataFrame): DataFrame containing loaner vehicle information.
+            cache (InServiceDateCache): Optional VIN cache; only VINs missing from it or
+                stale are sent to the Order API, and successful lookups are recorded in it.
 
         Returns:
             pd.DataFrame: Updated DataFrame with in-service dates and cleaned up columns.
+            Dropped VINs are listed in ``self.dropped_vins``. VINs whose lookups failed
+            are dropped too and listed in ``self.failed_vins``, and those that ran out of
+            retries on throttling, server or connection errors also in ``self.exhausted_vins``.
         """
         # Use base_url from secrets manager
         base_url = self.secrets["base_url"]
@@ -203,50 +336,135 @@ class OrderClient(BaseClient):
             "Api-Version": "2.0",
         }
 
+        auth_lock = asyncio.Lock()
+
+        async def renew_token(stale_token: str = None):
+            # One coroutine refreshes at a time; the others then see the new token
+            async with auth_lock:
+                if stale_token is None:
+                    if not self.token_manager.needs_refresh():
+                        return
+                    new_token = await asyncio.to_thread(self.token_manager.get)
+                elif headers["Authorization"] != f"Bearer {stale_token}":
+                    return
+                else:
+                    new_token = await asyncio.to_thread(self.refresh_token, stale_token)
+                headers["Authorization"] = f"Bearer {new_token}"
+
         dropped_records = []
         total_records = len(loaners_df)
 
-        async def fetch_in_service_date(session, index, row):
-            url = f"{base_url}/{row['vin']}"
-            try:
-                async with session.get(url, headers=headers, timeout=timeout) as resp:
-                    resp.raise_for_status()
-                    response_json = await resp.json()
-                    in_service_date = response_json["responseDetails"]["order"]["vehicleOrderDetails"]["customer"].get("customerHandoverDate", None)
-                    
-                    if in_service_date:
-                        loaners_df.at[index, "in_service_date"] = in_service_date
-                        logger.info(f"Successfully fetched in-service date for VIN: {row['vin'][:-4]}****")
-                    else:
-                        dropped_records.append(row['vin'])
-                        logger.info(f"No customerHandoverDate for VIN: {row['vin'][:-4]}****. Record will be dropped.")
-                        loaners_df.at[index, "in_service_date"] = None
-
-            except aiohttp.ClientResponseError as http_err:
-                logger.error(f"HTTP error occurred for VIN {row['vin']}: {http_err}")
-                loaners_df.at[index, "in_service_date"] = None
-            except Exception as err:
-                logger.error(f"An error occurred for VIN {row['vin']}: {err}")
-                loaners_df.at[index, "in_service_date"] = None
-
-        # Prepare the connector and session
-        connector = aiohttp.TCPConnector(limit=100, ssl=False)
-        timeout = aiohttp.ClientTimeout(total=120)
-        batch_size = 500  # creating a batch size
-        start = 0
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            while start < len(loaners_df):
-                tasks = [fetch_in_service_date(session, index, row) for index, row in loaners_df[start: start+batch_size].iterrows()]
-                await asyncio.gather(*tasks)
-                start += batch_size
+        # Work on a plain VIN array and collect results into a preallocated array by
+        # position, so the event loop never touches the DataFrame while requests run
+        vins = loaners_df["vin"].to_numpy(dtype=object)
+        in_service_dates = np.full(total_records, None, dtype=object)
+
+        # Serve fresh cached lookups and only send the remaining VINs to the API
+        pending = range(total_records)
+        if cache is not None:
+            cached_dates = cache.get_many(vins)
+            pending = []
+            for position, vin in enumerate(vins):
+                if vin in cached_dates:
+                    in_service_dates[position] = cached_dates[vin] or None
+                    if not cached_dates[vin]:
+                        dropped_records.append(vin)
+                else:
+                    pending.append(position)
+            logger.info(
+                "VIN cache hits: %d, VINs to fetch from Order API: %d",
+                total_records - len(pending), len(pending),
+            )
+
+        policy = self.transport.retry_policy
+
+        async def fetch_in_service_date(position):
+            vin = vins[position]
+            url = f"{base_url}/{vin}"
+            # Refresh ahead of expiry so long enrichment runs never send an expired token
+            if self.token_manager.needs_refresh():
+                await renew_token()
+            for attempt in range(2):
+                sent_authorization = headers["Authorization"]
+                try:
+                    # The scheduler owns retries here so it can adapt concurrency
+                    resp = await self.transport.request("GET", url, retry=False, headers=headers)
+                except httpx.TransportError as err:
+                    raise RetryableError(f"Connection error for VIN {vin}: {err!r}") from err
+                if resp.status_code == 401 and attempt == 0:
+                    await renew_token(sent_authorization[len("Bearer "):])
+                    continue
+                # Throttling and server errors are retried by the scheduler
+                if policy.is_retryable(resp.status_code):
+                    raise RetryableError(
+                        f"HTTP {resp.status_code} for VIN {vin}",
+                        status=resp.status_code,
+                        retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                    )
+                if resp.status_code == 404:
+                    # No order for this VIN yet, which is handled like a missing handover date
+                    response_json = {}
+                    break
+                resp.raise_for_status()
+                response_json = resp.json()
+                break
+
+            in_service_date = self._handover_date(response_json)
+
+            if cache is not None:
+                cache.put(vin, in_service_date)
+
+            # Per-VIN lines are sampled; the totals are logged once the run is done
+            if in_service_date:
+                in_service_dates[position] = in_service_date
+                logger.info("Successfully fetched in-service date for VIN: %s****", vin[:-4],
+                            extra={"sampled": True})
+            else:
+                dropped_records.append(vin)
+                logger.info("No customerHandoverDate for VIN: %s****. Record will be dropped.", vin[:-4],
+                            extra={"sampled": True})
+
+        # Keep a steady, adaptive number of requests in flight instead of fixed batches
+        scheduler = AdaptiveScheduler(
+            initial_concurrency=ORDER_API_INITIAL_CONCURRENCY,
+            max_concurrency=ORDER_API_MAX_CONCURRENCY,
+            max_retries=policy.max_retries,
+            base_backoff=policy.base_backoff,
+            max_backoff=policy.max_backoff,
+        )
+        stats = await scheduler.run(pending, fetch_in_service_date)
+        self.dropped_vins = dropped_records
+        self.failed_vins = [vins[position] for position in stats.failures]
+        self.exhausted_vins = [vins[position] for position in stats.exhausted]
+
+        if stats.failures:
+            failed_sample = dict(itertools.islice(
+                ((vins[position], str(err)) for position, err in stats.failures.items()),
+                LOG_VIN_SAMPLE_SIZE,
+            ))
+            logger.error("Failed to fetch in-service dates for %d VINs (%d after retries).",
+                         len(stats.failures), len(stats.exhausted),
+                         extra={"failed_vins_sample": failed_sample})
+        logger.info(
+            "Order API requests: %d succeeded, %d failed, %d retried, %d throttled, "
+            "%d server errors, final concurrency %.1f",
+            stats.succeeded, stats.failed, stats.retries, stats.throttled,
+            stats.server_errors, stats.final_concurrency,
+        )
+
+        # Merge the collected results into the frame in one vectorized step
+        loaners_df = loaners_df.assign(in_service_date=in_service_dates)
 
         # Drop records with missing in_service_date (i.e., those with no customerHandoverDate)
         loaners_df = loaners_df.dropna(subset=["in_service_date"])
 
         # Log the summary
-        logger.info(f"Total VINs fetched: {total_records}")
-        logger.info(f"VINs with missing customerHandoverDate (dropped): {len(dropped_records)}")
-        logger.info(f"List of dropped VINs: {', '.join(dropped_records)}")
+        logger.info("Total VINs fetched: %d", total_records)
+        logger.info("VINs with no order or customerHandoverDate (dropped): %d", len(dropped_records),
+                    extra={"dropped_vins_sample": dropped_records[:LOG_VIN_SAMPLE_SIZE]})
+        run_metrics.count("vins_enriched", len(loaners_df))
+        run_metrics.count("vins_dropped", len(dropped_records))
+        run_metrics.count("vins_failed", len(stats.failures))
 
         # Clean up the DataFrame columns
         loaners_df["oem_dealer_code"] = loaners_df["globalRetailerCode"].str.replace("6US", "")
@@ -262,3 +480,18 @@ class OrderClient(BaseClient):
             inplace=True,
         )
         return loaners_df
+
+    @staticmethod
+    def _handover_date(response_json: dict) -> Optional[str]:
+        """
+        Reads the customerHandoverDate from an Order API response.
+
+        Returns:
+            str: The handover date, or None when the order, the customer or the date is missing.
+        """
+        details = response_json
+        for key in ("responseDetails", "order", "vehicleOrderDetails", "customer"):
+            details = details.get(key) if isinstance(details, dict) else None
+        if not isinstance(details, dict):
+            return None
+        return details.get("customerHandoverDate")
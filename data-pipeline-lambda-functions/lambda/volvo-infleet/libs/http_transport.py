@@ -0,0 +1,242 @@
+"""
+This module provides the shared async HTTP transport for the Volvo InFleet API clients.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, FrozenSet, Optional
+
+import httpx
+
+from libs.adaptive_scheduler import parse_retry_after
+from libs.run_metrics import run_metrics
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "300"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+HTTP_VERIFY_TLS = os.getenv("HTTP_VERIFY_TLS", "true").lower() == "true"
+
+logger = logging.getLogger("OEM_Infleeter")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    The retry policy shared by every Volvo API call.
+
+    Token and loaner calls are retried by the transport itself. Order calls are
+    retried by the AdaptiveScheduler, which is configured from the same policy.
+    """
+
+    max_retries: int = 5
+    base_backoff: float = 0.5
+    max_backoff: float = 30.0
+    # Total seconds one request may spend waiting between its attempts
+    retry_budget: float = 120.0
+    retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+    @staticmethod
+    def from_env() -> "RetryPolicy":
+        """
+        Build the policy from HTTP_MAX_RETRIES, HTTP_BASE_BACKOFF_SECONDS,
+        HTTP_MAX_BACKOFF_SECONDS and HTTP_RETRY_BUDGET_SECONDS.
+
+        Returns:
+            RetryPolicy: The configured policy.
+        """
+        return RetryPolicy(
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES", "5")),
+            base_backoff=float(os.getenv("HTTP_BASE_BACKOFF_SECONDS", "0.5")),
+            max_backoff=float(os.getenv("HTTP_MAX_BACKOFF_SECONDS", "30")),
+            retry_budget=float(os.getenv("HTTP_RETRY_BUDGET_SECONDS", "120")),
+        )
+
+    def is_retryable(self, status: int) -> bool:
+        """Tell whether a response status is worth retrying."""
+        return status in self.retry_statuses
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None,
+                waited: float = 0.0) -> Optional[float]:
+        """
+        Compute the delay before the next attempt.
+
+        Args:
+            attempt (int): Number of attempts already made, starting at 0.
+            retry_after (float): Delay requested by the server. It is waited in full,
+                since retrying any sooner only earns another 429.
+            waited (float): Seconds already spent waiting on earlier attempts.
+
+        Returns:
+            float: Seconds to wait, with full jitter unless the server asked for a
+            delay, or None if waiting would exceed the retry budget.
+        """
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        if waited + delay > self.retry_budget:
+            return None
+        return delay
+
+
+class HttpTransport:
+    """
+    One pooled ``httpx.AsyncClient`` serving token, loaner and order calls.
+
+    The client and its event loop live as long as the container, so warm
+    invocations reuse open keep-alive connections instead of repeating the TLS
+    handshake. HTTP/2 multiplexing is used when HTTP2_ENABLED is set and the
+    h2 package is installed.
+    """
+
+    def __init__(self, retry_policy: RetryPolicy = None, http2: bool = HTTP2_ENABLED,
+                 max_connections: int = HTTP_MAX_CONNECTIONS,
+                 keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+                 timeout: float = HTTP_TIMEOUT, verify: bool = HTTP_VERIFY_TLS):
+        """
+        Initialize the transport. The HTTP client itself is created on first use.
+
+        Args:
+            retry_policy (RetryPolicy): Retry policy; read from the environment by default.
+            http2 (bool): Negotiate HTTP/2 where the server supports it.
+            max_connections (int): Upper bound on pooled connections.
+            keepalive_expiry (float): Seconds an idle connection is kept open.
+            timeout (float): Per-request timeout in seconds.
+            verify (bool): Verify TLS certificates.
+        """
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.verify = verify
+        self.loop = asyncio.new_event_loop()
+        self._client = None
+
+    def run(self, coro):
+        """
+        Run a coroutine on the transport's event loop from synchronous code.
+
+        Args:
+            coro: The coroutine to run.
+
+        Returns:
+            The coroutine's result.
+        """
+        if self.loop.is_running():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is self.loop:
+                coro.close()
+                raise RuntimeError("HttpTransport.run() called from its own event loop; await instead.")
+            # Called from a worker thread while the loop serves other requests
+            return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+        return self.loop.run_until_complete(coro)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled HTTP client, created on first use."""
+        if self._client is None:
+            http2 = self.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("HTTP2_ENABLED is set but h2 is not installed; using HTTP/1.1.")
+                    http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                verify=self.verify,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            logger.info("HTTP transport created (HTTP/2: %s).", http2)
+        return self._client
+
+    async def request(self, method: str, url: str, retry: bool = True, **kwargs) -> httpx.Response:
+        """
+        Send a request and read its body.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            retry (bool): Retry connection errors and retryable statuses per the policy.
+                Callers with their own retry loop pass False.
+            **kwargs: Passed to ``httpx.AsyncClient.request``, e.g. headers, params, data.
+
+        Returns:
+            httpx.Response: The final response, whatever its status.
+        """
+        async with self.stream(method, url, retry=retry, **kwargs) as response:
+            await response.aread()
+        return response
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, retry: bool = True,
+                     **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Send a request and yield the response before its body has been read.
+
+        Retries happen before the response is yielded, so a caller never sees a
+        partial body from a failed attempt.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            retry (bool): Retry connection errors and retryable statuses per the policy.
+            **kwargs: Passed to ``httpx.AsyncClient.build_request``.
+
+        Yields:
+            httpx.Response: The response; read it with ``aiter_bytes`` or ``aread``.
+        """
+        policy = self.retry_policy
+        attempt = 0
+        waited = 0.0
+        while True:
+            request = self.client.build_request(method, url, **kwargs)
+            run_metrics.count("http_requests")
+            try:
+                response = await self.client.send(request, stream=True)
+            except httpx.TransportError as e:
+                run_metrics.count("http_errors")
+                if not retry or attempt >= policy.max_retries:
+                    raise
+                delay = policy.backoff(attempt, waited=waited)
+                if delay is None:
+                    raise
+                logger.warning("%s %s failed (%r), retrying in %.1fs.", method, url, e, delay)
+            else:
+                if response.status_code == 429:
+                    run_metrics.count("http_throttled")
+                elif response.status_code >= 400:
+                    run_metrics.count("http_errors")
+                delay = None
+                if retry and policy.is_retryable(response.status_code) and attempt < policy.max_retries:
+                    delay = policy.backoff(attempt, parse_retry_after(response.headers.get("Retry-After")),
+                                           waited)
+                    if delay is None:
+                        logger.warning("%s %s returned %d; the requested wait exceeds the retry budget, "
+                                       "giving up.", method, url, response.status_code)
+                if delay is None:
+                    try:
+                        yield response
+                    finally:
+                        await response.aclose()
+                    return
+                await response.aclose()
+                logger.warning("%s %s returned %d, retrying in %.1fs.",
+                               method, url, response.status_code, delay)
+            attempt += 1
+            waited += delay
+            await asyncio.sleep(delay)
@@ -0,0 +1,206 @@
+# s3_uploader.py
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+MB = 1024 * 1024
+MIN_PART_SIZE = 5 * MB  # S3 rejects smaller non-final parts
+
+
+@dataclass
+class UploadSettings:
+    """Tunables for S3Uploader"""
+
+    multipart_threshold: int = 16 * MB
+    part_size: int = 16 * MB
+    max_concurrency: int = 4
+    max_in_flight_parts: int = 6
+    checksum_algorithm: Optional[str] = None  # CRC32, CRC32C, SHA1 or SHA256
+
+    def __post_init__(self):
+        self.part_size = max(MIN_PART_SIZE, self.part_size)
+        self.max_concurrency = max(1, self.max_concurrency)
+        self.max_in_flight_parts = max(self.max_concurrency, self.max_in_flight_parts)
+        self.checksum_algorithm = self.checksum_algorithm.upper() if self.checksum_algorithm else None
+
+    @staticmethod
+    def from_env() -> "UploadSettings":
+        """Build settings from S3_* environment variables"""
+        return UploadSettings(
+            multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16")) * MB,
+            part_size=int(os.getenv("S3_PART_SIZE_MB", "16")) * MB,
+            max_concurrency=int(os.getenv("S3_UPLOAD_CONCURRENCY", "4")),
+            max_in_flight_parts=int(os.getenv("S3_MAX_IN_FLIGHT_PARTS", "6")),
+            checksum_algorithm=os.getenv("S3_CHECKSUM_ALGORITHM") or None,
+        )
+
+
+@dataclass
+class UploadReport:
+    """Throughput figures for one upload"""
+
+    bucket: str
+    key: str
+    bytes: int = 0
+    parts: int = 0
+    elapsed_seconds: float = 0.0
+    part_latencies: List[float] = field(default_factory=list)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> dict:
+        latencies = sorted(self.part_latencies)
+        return {
+            "s3_key": self.key,
+            "bytes": self.bytes,
+            "parts": self.parts,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "bytes_per_second": round(self.bytes_per_second),
+            "part_latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "part_latency_max": round(latencies[-1], 3) if latencies else None,
+        }
+
+
+class S3Uploader:
+    """
+    Upload file paths, buffers or iterators of byte chunks to S3.
+
+    Sources smaller than the multipart threshold go up with one put_object.
+    Larger ones become a multipart upload whose parts are sent concurrently,
+    with at most ``max_in_flight_parts`` parts held in memory at once.
+    """
+
+    def __init__(self, client, settings: Optional[UploadSettings] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        :param client: boto3 S3 client.
+        :param settings: Upload tunables; defaults when omitted.
+        :param logger: The lambda's logger, so errors reach its JSON handler.
+        """
+        self.client = client
+        self.settings = settings or UploadSettings()
+        self.logger = logger or logging.getLogger(__name__)
+
+    def upload(self, source, bucket: str, key: str) -> UploadReport:
+        """
+        Upload ``source`` to ``s3://bucket/key``.
+
+        :param source: A file path, a bytes-like object, a readable binary
+            file object, or an iterable of bytes chunks.
+        :return: An UploadReport with bytes moved, throughput and part latencies.
+        """
+        report = UploadReport(bucket=bucket, key=key)
+        started = time.monotonic()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                self._upload_parts(self._iter_parts(f), bucket, key, report)
+        else:
+            self._upload_parts(self._iter_parts(source), bucket, key, report)
+        report.elapsed_seconds = time.monotonic() - started
+        return report
+
+    def _iter_parts(self, source):
+        """Re-chunk the source into part-size blocks (the last one may be smaller)"""
+        part_size = self.settings.part_size
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source)
+            for start in range(0, len(view), part_size):
+                yield bytes(view[start:start + part_size])
+            return
+        if hasattr(source, "read"):
+            while True:
+                data = source.read(part_size)
+                if not data:
+                    return
+                yield data
+        buffer = bytearray()
+        for data in source:
+            buffer += data
+            while len(buffer) >= part_size:
+                yield bytes(buffer[:part_size])
+                del buffer[:part_size]
+        if buffer:
+            yield bytes(buffer)
+
+    def _upload_parts(self, parts, bucket, key, report):
+        # Buffer up to the threshold to decide between a single put and multipart
+        head, head_size = [], 0
+        for part in parts:
+            head.append(part)
+            head_size += len(part)
+            if head_size >= self.settings.multipart_threshold:
+                break
+        else:
+            body = b"".join(head)
+            self.client.put_object(Bucket=bucket, Key=key, Body=body, **self._checksum_args())
+            report.bytes, report.parts = len(body), 1
+            return
+
+        upload_id = self.client.create_multipart_upload(
+            Bucket=bucket, Key=key, **self._checksum_args()
+        )["UploadId"]
+        try:
+            completed = self._send_parts(head, parts, bucket, key, upload_id, report)
+            self.client.complete_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": completed},
+            )
+        except Exception:
+            try:
+                self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            except Exception as abort_error:
+                # Surface the upload error, not the abort's; the parts are left behind
+                self.logger.error("Failed to abort multipart upload %s for s3://%s/%s: %s",
+                             upload_id, bucket, key, abort_error)
+            raise
+
+    def _send_parts(self, head, parts, bucket, key, upload_id, report):
+        in_flight = threading.BoundedSemaphore(self.settings.max_in_flight_parts)
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.settings.max_concurrency) as executor:
+            for body in _chain(head, parts):
+                # Stop reading early if a part has already failed
+                failed = next((f for f in futures if f.done() and f.exception()), None)
+                if failed is not None:
+                    failed.result()
+                in_flight.acquire()
+                future = executor.submit(
+                    self._upload_part, bucket, key, upload_id, len(futures) + 1, body
+                )
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+                report.bytes += len(body)
+            results = [future.result() for future in futures]
+
+        report.parts = len(results)
+        report.part_latencies = [latency for _, latency in results]
+        return [part for part, _ in results]
+
+    def _upload_part(self, bucket, key, upload_id, part_number, body):
+        started = time.monotonic()
+        response = self.client.upload_part(
+            Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
+            Body=body, **self._checksum_args(),
+        )
+        part = {"PartNumber": part_number, "ETag": response["ETag"]}
+        if self.settings.checksum_algorithm:
+            checksum_field = f"Checksum{self.settings.checksum_algorithm}"
+            part[checksum_field] = response[checksum_field]
+        return part, time.monotonic() - started
+
+    def _checksum_args(self) -> dict:
+        if self.settings.checksum_algorithm:
+            return {"ChecksumAlgorithm": self.settings.checksum_algorithm}
+        return {}
+
+
+def _chain(head, rest):
+    yield from head
+    head.clear()  # release buffered parts as soon as they are submitted
+    yield from rest
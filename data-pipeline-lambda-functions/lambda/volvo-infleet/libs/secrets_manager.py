@@ -3,23 +3,27 @@ This module provides functionality for managing secrets and configurations
 for the Volvo InFleet service integration.
 """
 
-import json
 import logging
 from pathlib import Path
 
-import boto3
 import yaml
 
 from dataclasses import dataclass, field
-from typing import Any, Dict
+from typing import Any, Dict, List
 from libs.endpoint import Endpoint
+from libs.secrets_cache import secrets_cache
 
 logger = logging.getLogger("OEM_Infleeter")
+secrets_cache.set_logger(logger)
 
 
 class SecretsManager:
     """
     A class to manage secrets using AWS Secrets Manager.
+
+    Secret values come from a process-wide cache, so the handler, the service
+    and each API client share one lookup per secret and warm invocations skip
+    Secrets Manager until the cache TTL runs out.
     """
 
     def __init__(self, secret_name: str):
@@ -32,6 +36,21 @@ class SecretsManager:
         self.secret_name = secret_name
         logger.info("SecretsManager initialized with secret name: %s", secret_name)
 
+    @staticmethod
+    def prefetch(secret_names: List[str]) -> None:
+        """
+        Fetch several secrets in one batched call ahead of use.
+
+        Args:
+            secret_names (list): The names of the secrets to fetch.
+        """
+        logger.info("Prefetching %d secrets.", len(secret_names))
+        try:
+            secrets_cache.get_many(secret_names)
+        except Exception as e:
+            # get_secret retries each secret on its own and reports its own error
+            logger.warning("Failed to prefetch secrets: %s", e)
+
     def get_secret(self) -> Dict[str, Any]:
         """
         Retrieve the secret from AWS Secrets Manager.
@@ -44,17 +63,9 @@ class SecretsManager:
         """
         logger.info("Attempting to retrieve secret: %s", self.secret_name)
         try:
-            secrets_client = boto3.client("secretsmanager")
-            get_secret_value_response = secrets_client.get_secret_value(
-                SecretId=self.secret_name
-            )
-            if "SecretString" in get_secret_value_response:
-                secret = get_secret_value_response["SecretString"]
-            else:
-                secret = get_secret_value_response["SecretBinary"]
-
+            secret = secrets_cache.get(self.secret_name)
             logger.info("Secret retrieved successfully.")
-            return json.loads(secret)
+            return secret
         except Exception as e:
             error_message = str(e)
             if "DecryptionFailureException" in error_message:
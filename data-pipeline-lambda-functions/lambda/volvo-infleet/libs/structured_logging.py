@@ -1,8 +1,22 @@
 import logging
+import os
+import queue
+import threading
 from datetime import datetime, timezone
 import json_log_formatter
 import sys
 
+try:
+    import orjson
+except ImportError:  # the standard json module is used instead
+    orjson = None
+
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "256"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATE = int(os.getenv("LOG_SAMPLE_RATE", "100"))
+
+
 class StructuredLoggerBuilder:
     """
     Structured logger builder. For the default use, it can be called
@@ -10,7 +24,10 @@ class StructuredLoggerBuilder:
         logger = StructuredLogBuilder(__name__).build()
         logger.info('semi-important message...'
     ```
-    By default, the logger is configured to log level INFO and to stderr
+    By default, the logger is configured to log level INFO and to stderr.
+    Records are written by a background thread in batches (LOG_ASYNC), and
+    records logged with ``extra={"sampled": True}`` are kept one in
+    LOG_SAMPLE_RATE per call site.
     """
 
     def __init__(self, name):
@@ -18,6 +35,8 @@ class StructuredLoggerBuilder:
         self._handler = logging.StreamHandler(sys.stderr)
         self._level = logging.INFO
         self._name = name
+        self._asynchronous = LOG_ASYNC
+        self._sample_rate = LOG_SAMPLE_RATE
 
     def level(self, level):
         """
@@ -37,7 +56,25 @@ class StructuredLoggerBuilder:
         self._handler = handler
         return self
 
-    def build(self):    
+    def asynchronous(self, enabled=True):
+        """
+        write records from a background thread instead of the logging call.
+        :param enabled:
+        :return:
+        """
+        self._asynchronous = enabled
+        return self
+
+    def sample_rate(self, rate):
+        """
+        keep one in ``rate`` sampled records per call site; 1 keeps them all.
+        :param rate:
+        :return:
+        """
+        self._sample_rate = rate
+        return self
+
+    def build(self):
         """
         Builds and returns the logger.
         :return: Configured logger instance.
@@ -47,17 +84,37 @@ class StructuredLoggerBuilder:
         # Prevent duplicate logs by disabling propagation to the root logger
         logger.propagate = False
         if logger.hasHandlers():
+            for handler in logger.handlers:
+                handler.close()  # writes out anything still queued
             logger.handlers.clear()
 
         # Set up the handler and formatter
         self._handler.setFormatter(self._formatter)
-        logger.addHandler(self._handler)
+        logger.addHandler(AsyncBatchHandler(self._handler) if self._asynchronous else self._handler)
         logger.setLevel(self._level)
+        set_sampling(logger, self._sample_rate)
 
         return logger
 
 
-class DatetimeJsonFormatter(json_log_formatter.JSONFormatter):
+class FastJsonFormatter(json_log_formatter.JSONFormatter):
+    """
+    JSON log formatter that serializes with orjson when it is installed
+    """
+
+    def to_json(self, record):
+        if orjson is not None:
+            try:
+                # orjson is a compiled extension pylint cannot introspect
+                return orjson.dumps(  # pylint: disable=no-member
+                    record, default=_json_default, option=orjson.OPT_NON_STR_KEYS  # pylint: disable=no-member
+                ).decode("utf-8")
+            except TypeError:
+                pass  # the standard encoder stringifies what orjson rejects
+        return super().to_json(record)
+
+
+class DatetimeJsonFormatter(FastJsonFormatter):
     """
     JSON log formatter that includes a timestamp
     """
@@ -70,11 +127,187 @@ class DatetimeJsonFormatter(json_log_formatter.JSONFormatter):
         extra["funcName"] = record.funcName
         extra["lineno"] = record.lineno
 
-        # Include a timezone-aware timestamp in UTC
+        # Include a timezone-aware timestamp in UTC, taken when the record was
+        # logged rather than when the writer thread formats it
         if "timestamp" not in extra:
-            extra["timestamp"] = datetime.now(timezone.utc).isoformat()
+            extra["timestamp"] = datetime.fromtimestamp(record.created, timezone.utc).isoformat()
 
         if record.exc_info:
             extra["exc_info"] = self.formatException(record.exc_info)
 
         return extra
+
+
+class AsyncBatchHandler(logging.Handler):
+    """
+    Non-blocking handler that takes formatting and I/O off the logging call.
+
+    Records are queued by the caller, then formatted with the target handler's
+    formatter and written by a background thread, one write per batch for
+    stream handlers. When the queue is full, INFO and DEBUG records are
+    dropped and counted rather than blocking the caller; warnings and errors
+    wait for room. Call ``flush`` before a Lambda invocation returns, since
+    the container is frozen afterwards.
+    """
+
+    def __init__(self, target, batch_size=LOG_BATCH_SIZE, max_queue=LOG_QUEUE_SIZE):
+        """
+        :param target: Handler that formats and writes the records, e.g. a StreamHandler.
+        :param batch_size: Most records written at once.
+        :param max_queue: Most records waiting to be written.
+        """
+        super().__init__(target.level)
+        self.target = target
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        # Records are formatted by the target in the writer thread
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        try:
+            if record.args:
+                # Merge the arguments now, while they still hold their current values
+                record.msg = record.getMessage()
+                record.args = None
+            self._start_writer()
+            if record.levelno >= logging.WARNING:
+                self._queue.put(record)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        if self._writer is not None:
+            self._queue.join()
+        self.target.flush()
+
+    def close(self):
+        try:
+            if self._writer is not None and self._writer.is_alive():
+                self._queue.put(None)
+                self._writer.join()
+            self.target.close()
+        finally:
+            self._writer = None
+            super().close()
+
+    def _start_writer(self):
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._write_batches, name="log-writer", daemon=True
+                    )
+                    self._writer.start()
+
+    def _write_batches(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                records = [record for record in batch if record is not None]
+                if self.dropped:
+                    dropped, self.dropped = self.dropped, 0
+                    records.append(logging.makeLogRecord({
+                        "name": records[0].name if records else __name__,
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"Log queue full, dropped {dropped} records",
+                    }))
+                self._write(records)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                return
+
+    def _write(self, records):
+        stream = getattr(self.target, "stream", None)
+        if stream is None:
+            for record in records:
+                self.target.handle(record)
+            return
+
+        lines = []
+        for record in records:
+            if not self.target.filter(record):
+                continue
+            try:
+                lines.append(self.target.format(record) + self.target.terminator)
+            except Exception:
+                self.target.handleError(record)
+        if lines:
+            try:
+                with self.target.lock:
+                    stream.write("".join(lines))
+                    stream.flush()
+            except Exception:
+                self.target.handleError(records[-1])
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in ``rate`` records logged with ``extra={"sampled": True}``,
+    counted per call site, and tags the kept ones with the rate. Warnings and
+    errors are always kept.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        call_site = (record.pathname, record.lineno)
+        with self._lock:
+            seen = self._seen.get(call_site, 0)
+            self._seen[call_site] = seen + 1
+        if seen % self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+def set_sampling(logger, rate):
+    """
+    Replace the logger's sampling filter with one keeping one in ``rate`` sampled records.
+    :param logger:
+    :param rate:
+    :return:
+    """
+    for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+        logger.removeFilter(existing)
+    if rate > 1:
+        logger.addFilter(SamplingFilter(rate))
+
+
+def flush_logs(logger):
+    """
+    Write out everything the logger's handlers still hold, e.g. before a Lambda invocation returns.
+    :param logger:
+    :return:
+    """
+    for handler in logger.handlers:
+        handler.flush()
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,144 @@
+"""
+This module persists the incremental sync checkpoint for the Volvo InFleet integration.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from botocore.exceptions import ClientError
+from libs.startup import startup
+
+logger = logging.getLogger("OEM_Infleeter")
+
+
+class SyncCheckpoint:
+    """
+    Stores the most recent loaner lastModifiedDate already delivered to the landing zone.
+
+    Loaners fetched but not delivered, because they have no handover date yet or
+    their lookup failed, are kept next to the checkpoint as pending loaners, so
+    later runs can enrich them again even though the checkpoint has moved past them.
+
+    The checkpoint lives in S3 by default. Setting ``local_path`` uses a local
+    JSON file instead, which is handy for local runs and tests.
+    """
+
+    def __init__(self, bucket: str = None, key: str = None, local_path: str = None):
+        """
+        Initialize the checkpoint store.
+
+        Args:
+            bucket (str): S3 bucket holding the checkpoint object.
+            key (str): S3 key of the checkpoint object.
+            local_path (str): Local file used instead of S3 when set.
+        """
+        self.bucket = bucket
+        self.key = key
+        self.local_path = Path(local_path) if local_path else None
+        self.last_modified_date = None
+        self.pending = []  # loaner records, as returned by the Loaner API
+
+    @staticmethod
+    def from_env(env_vars: dict) -> "SyncCheckpoint":
+        """
+        Build the checkpoint store from environment variables.
+
+        SYNC_STATE_PATH selects a local file; otherwise the checkpoint is stored in the
+        landing-zone bucket under SYNC_STATE_KEY.
+
+        Args:
+            env_vars (dict): Output of ``load_environment_variables``.
+
+        Returns:
+            SyncCheckpoint: The configured checkpoint store.
+        """
+        local_path = os.getenv("SYNC_STATE_PATH")
+        key = os.getenv(
+            "SYNC_STATE_KEY",
+            f"data/infleet/volvo/state/{env_vars['env']}/sync_checkpoint.json",
+        )
+        return SyncCheckpoint(bucket=env_vars["lz_bucket"], key=key, local_path=local_path)
+
+    def load(self) -> Optional[str]:
+        """
+        Load the checkpoint.
+
+        Returns:
+            str: The checkpoint formatted as a lastSyncDate, or None if there is none yet.
+        """
+        try:
+            if self.local_path:
+                if not self.local_path.exists():
+                    return None
+                state = json.loads(self.local_path.read_text())
+            else:
+                response = startup.client("s3").get_object(Bucket=self.bucket, Key=self.key)
+                state = json.loads(response["Body"].read())
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                logger.info("No sync checkpoint found at s3://%s/%s", self.bucket, self.key)
+                return None
+            logger.error("Failed to load sync checkpoint: %s", e)
+            raise
+
+        self.last_modified_date = state.get("last_modified_date")
+        self.pending = state.get("pending_loaners", [])
+        logger.info("Loaded sync checkpoint: %s, %d pending loaners",
+                    self.last_modified_date, len(self.pending))
+        return self.last_modified_date
+
+    def pending_loaners(self, since: datetime) -> Optional[pd.DataFrame]:
+        """
+        Get the pending loaners, dropping those last modified before ``since``.
+
+        Args:
+            since (datetime): Oldest lastModifiedDate still worth enriching, i.e. the lookback window.
+
+        Returns:
+            pd.DataFrame: The pending loaner records, or None if there are none.
+        """
+        if not self.pending:
+            return None
+        pending_df = pd.DataFrame(self.pending)
+        pending_df["lastModifiedDate"] = pd.to_datetime(pending_df["lastModifiedDate"], utc=True)
+        expired = pending_df["lastModifiedDate"] < since
+        if expired.any():
+            logger.info("Dropping %d pending loaners older than %s", int(expired.sum()), since.isoformat())
+            pending_df = pending_df[~expired]
+        return pending_df if len(pending_df) else None
+
+    def save(self, last_modified_date: Optional[datetime], pending_df: Optional[pd.DataFrame] = None) -> None:
+        """
+        Advance the checkpoint and replace the pending loaners.
+
+        Args:
+            last_modified_date (datetime): The max lastModifiedDate that was delivered,
+                or None to keep the loaded checkpoint.
+            pending_df (pd.DataFrame): Loaner records still to be enriched on later runs.
+        """
+        checkpoint = self.last_modified_date
+        if last_modified_date is not None:
+            if last_modified_date.tzinfo is None:
+                last_modified_date = last_modified_date.replace(tzinfo=timezone.utc)
+            last_modified_date = last_modified_date.astimezone(timezone.utc)
+            checkpoint = (
+                last_modified_date.strftime("%Y-%m-%dT%H:%M:%S.")
+                + f"{last_modified_date.microsecond // 1000:03d}Z"
+            )
+        pending = []
+        if pending_df is not None and len(pending_df):
+            pending = json.loads(pending_df.to_json(orient="records", date_format="iso"))
+        body = json.dumps({"last_modified_date": checkpoint, "pending_loaners": pending})
+
+        if self.local_path:
+            self.local_path.parent.mkdir(parents=True, exist_ok=True)
+            self.local_path.write_text(body)
+        else:
+            startup.client("s3").put_object(Bucket=self.bucket, Key=self.key, Body=body)
+        self.last_modified_date, self.pending = checkpoint, pending
+        logger.info("Saved sync checkpoint: %s, %d pending loaners", checkpoint, len(pending))
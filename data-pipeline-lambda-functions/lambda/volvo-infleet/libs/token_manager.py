@@ -0,0 +1,134 @@
+"""
+This module caches OAuth access tokens for the Volvo InFleet API clients.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+TOKEN_CACHE_DIR = os.getenv("TOKEN_CACHE_DIR", "/tmp/volvo-infleet-tokens")
+TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+# Lifetime assumed when the token response carries no expires_in
+TOKEN_DEFAULT_TTL_SECONDS = float(os.getenv("TOKEN_DEFAULT_TTL_SECONDS", "3600"))
+
+logger = logging.getLogger("OEM_Infleeter")
+
+# Tokens held by this container, keyed by client, reused across warm invocations
+_memory_tokens: Dict[str, dict] = {}
+
+
+class TokenManager:
+    """
+    Hands out a cached access token and fetches a new one only when needed.
+
+    Tokens are kept in memory and in a ``/tmp`` file per client, so warm invocations
+    skip the OAuth round trip. A token is refreshed ``refresh_margin`` seconds before
+    it expires. After a 401, ``refresh`` fetches a new token once; callers that hit
+    the same 401 concurrently get that token instead of fetching their own.
+    """
+
+    def __init__(self, client_key: str, fetch_token: Callable[[], dict],
+                 cache_dir: str = TOKEN_CACHE_DIR,
+                 refresh_margin: float = TOKEN_REFRESH_MARGIN_SECONDS):
+        """
+        Initialize the token manager.
+
+        Args:
+            client_key (str): Identifies the client, e.g. its auth URL and client id.
+            fetch_token (Callable): Requests a new token; returns the token response
+                with ``access_token`` and, optionally, ``expires_in``.
+            cache_dir (str): Directory for the per-client token files; None disables them.
+            refresh_margin (float): Seconds before expiry at which a token is refreshed.
+        """
+        self.client_key = client_key
+        self.fetch_token = fetch_token
+        digest = hashlib.sha256(client_key.encode("utf-8")).hexdigest()[:16]
+        self.cache_path = Path(cache_dir) / f"{digest}.json" if cache_dir else None
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        """
+        Return a valid access token, fetching a new one if the cached one is about to expire.
+
+        Returns:
+            str: The access token.
+        """
+        with self._lock:
+            entry = self._cached()
+            if entry is None:
+                entry = self._fetch()
+            return entry["access_token"]
+
+    def refresh(self, stale_token: str) -> str:
+        """
+        Replace a token the API rejected.
+
+        Args:
+            stale_token (str): The token that got the 401.
+
+        Returns:
+            str: The new access token, or the one another caller already fetched.
+        """
+        with self._lock:
+            entry = self._cached()
+            if entry is None or entry["access_token"] == stale_token:
+                entry = self._fetch()
+            return entry["access_token"]
+
+    def needs_refresh(self) -> bool:
+        """Tell whether the current token is missing or within the refresh margin of expiry."""
+        entry = _memory_tokens.get(self.client_key)
+        return entry is None or self._expiring(entry)
+
+    def _cached(self) -> Optional[dict]:
+        entry = _memory_tokens.get(self.client_key)
+        if entry is None:
+            entry = self._read_file()
+            if entry is not None:
+                _memory_tokens[self.client_key] = entry
+        if entry is None or self._expiring(entry):
+            return None
+        logger.info("Reusing cached authorization token.")
+        return entry
+
+    def _fetch(self) -> dict:
+        issued_at = time.time()
+        response = self.fetch_token()
+        expires_in = float(response.get("expires_in") or TOKEN_DEFAULT_TTL_SECONDS)
+        entry = {"access_token": response["access_token"], "expires_at": issued_at + expires_in}
+        _memory_tokens[self.client_key] = entry
+        self._write_file(entry)
+        logger.info("Cached new authorization token valid for %d seconds.", expires_in)
+        return entry
+
+    def _expiring(self, entry: dict) -> bool:
+        return time.time() >= entry["expires_at"] - self.refresh_margin
+
+    def _read_file(self) -> Optional[dict]:
+        if self.cache_path is None or not self.cache_path.exists():
+            return None
+        try:
+            return json.loads(self.cache_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable token cache %s: %s", self.cache_path, e)
+            return None
+
+    def _write_file(self, entry: dict) -> None:
+        if self.cache_path is None:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            # The token is a credential, so keep the file private to this user
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Could not persist token cache %s: %s", self.cache_path, e)
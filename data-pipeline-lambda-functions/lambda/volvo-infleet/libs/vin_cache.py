@@ -0,0 +1,150 @@
+"""
+This module provides a persistent VIN to in-service-date cache for the Order API enrichment.
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from botocore.exceptions import ClientError
+from libs.run_metrics import run_metrics
+from libs.startup import startup
+
+logger = logging.getLogger("OEM_Infleeter")
+
+# Entries loaded in this container, keyed by cache location, reused across warm invocations
+_memory_layer: Dict[str, Dict[str, dict]] = {}
+
+
+class InServiceDateCache:
+    """
+    Caches customerHandoverDate lookups by VIN, backed by S3 with an in-memory layer.
+
+    Dates found are kept for ``ttl_seconds``. VINs with no handover date yet are kept
+    for the shorter ``negative_ttl_seconds`` so they are re-checked regularly.
+    Failed lookups are never cached.
+    """
+
+    def __init__(self, bucket: str = None, key: str = None, local_path: str = None,
+                 ttl_seconds: float = 30 * 86400, negative_ttl_seconds: float = 86400):
+        """
+        Initialize the cache.
+
+        Args:
+            bucket (str): S3 bucket holding the cache object.
+            key (str): S3 key of the gzip JSON cache object.
+            local_path (str): Local file used instead of S3 when set.
+            ttl_seconds (float): Lifetime of a cached handover date.
+            negative_ttl_seconds (float): Lifetime of a cached "no handover date" result.
+        """
+        self.bucket = bucket
+        self.key = key
+        self.local_path = Path(local_path) if local_path else None
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._dirty = False
+        location = str(self.local_path) if self.local_path else f"s3://{bucket}/{key}"
+        self._entries = _memory_layer.setdefault(location, {})
+
+    @staticmethod
+    def from_env(env_vars: dict) -> "InServiceDateCache":
+        """
+        Build the cache from environment variables.
+
+        VIN_CACHE_PATH selects a local file; otherwise the cache is stored in the
+        landing-zone bucket under VIN_CACHE_KEY. VIN_CACHE_TTL_DAYS and
+        VIN_CACHE_NEGATIVE_TTL_HOURS set the expiries.
+
+        Args:
+            env_vars (dict): Output of ``load_environment_variables``.
+
+        Returns:
+            InServiceDateCache: The configured cache.
+        """
+        return InServiceDateCache(
+            bucket=env_vars["lz_bucket"],
+            key=os.getenv(
+                "VIN_CACHE_KEY",
+                f"data/infleet/volvo/state/{env_vars['env']}/vin_inservice_cache.json.gz",
+            ),
+            local_path=os.getenv("VIN_CACHE_PATH"),
+            ttl_seconds=float(os.getenv("VIN_CACHE_TTL_DAYS", "30")) * 86400,
+            negative_ttl_seconds=float(os.getenv("VIN_CACHE_NEGATIVE_TTL_HOURS", "24")) * 3600,
+        )
+
+    @run_metrics.timed("vin_cache_load")
+    def load(self) -> None:
+        """Load persisted entries unless this container already holds them."""
+        if self._entries:
+            logger.info("Using %d in-memory VIN cache entries.", len(self._entries))
+            return
+        try:
+            if self.local_path:
+                if not self.local_path.exists():
+                    return
+                body = self.local_path.read_bytes()
+            else:
+                body = startup.client("s3").get_object(Bucket=self.bucket, Key=self.key)["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                logger.info("No VIN cache found at s3://%s/%s", self.bucket, self.key)
+                return
+            logger.error("Failed to load VIN cache: %s", e)
+            raise
+        self._entries.update(json.loads(gzip.decompress(body)))
+        logger.info("Loaded %d VIN cache entries.", len(self._entries))
+
+    def get_many(self, vins: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Look up fresh entries.
+
+        Args:
+            vins (Iterable[str]): VINs to look up.
+
+        Returns:
+            dict: VIN to handover date (None for a cached negative result), for fresh hits only.
+        """
+        now = time.time()
+        hits = {}
+        for vin in vins:
+            entry = self._entries.get(vin)
+            if entry is not None and not self._expired(entry, now):
+                hits[vin] = entry["date"]
+        return hits
+
+    def put(self, vin: str, in_service_date: Optional[str]) -> None:
+        """
+        Record a successful lookup.
+
+        Args:
+            vin (str): The VIN looked up.
+            in_service_date (str): The handover date, or None if the order has none yet.
+        """
+        self._entries[vin] = {"date": in_service_date, "fetched_at": time.time()}
+        self._dirty = True
+
+    @run_metrics.timed("vin_cache_save")
+    def save(self) -> None:
+        """Persist the cache, dropping expired entries, if anything changed."""
+        if not self._dirty:
+            return
+        now = time.time()
+        for vin in [vin for vin, entry in self._entries.items() if self._expired(entry, now)]:
+            del self._entries[vin]
+        body = gzip.compress(json.dumps(self._entries).encode("utf-8"))
+
+        if self.local_path:
+            self.local_path.parent.mkdir(parents=True, exist_ok=True)
+            self.local_path.write_bytes(body)
+        else:
+            startup.client("s3").put_object(Bucket=self.bucket, Key=self.key, Body=body)
+        self._dirty = False
+        logger.info("Saved %d VIN cache entries.", len(self._entries))
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        ttl = self.ttl_seconds if entry["date"] else self.negative_ttl_seconds
+        return now - entry["fetched_at"] > ttl
@@ -9,6 +9,9 @@ logger = logging.getLogger("OEM_Infleeter")
 
 class VolvoInfleetService:
     def __init__(self, loaner_secret_name: str, order_secret_name: str):
+        # One batched lookup; the API clients then read both secrets from the cache
+        # pylint resolves SecretsManager to the recall lambda's class of the same name
+        SecretsManager.prefetch([loaner_secret_name, order_secret_name])  # pylint: disable=no-value-for-parameter
         self.loaner_endpoint = self._get_endpoint_from_secret(loaner_secret_name)
         self.order_endpoint = self._get_endpoint_from_secret(order_secret_name)
 
@@ -25,6 +25,13 @@ module "volvo_infleet_lambda" {
         aws_secretsmanager_secret.volvo_infleet_order.id
       ]
     },
+    {
+      # BatchGetSecretValue cannot be scoped to secrets; GetSecretValue above still
+      # limits which secrets it returns
+      actions   = ["secretsmanager:BatchGetSecretValue"]
+      effect    = "Allow"
+      resources = ["*"]
+    },
     {
       actions   = ["kms:Decrypt"]
       effect    = "Allow"
@@ -33,6 +40,7 @@ module "volvo_infleet_lambda" {
     {
       actions = [
         "s3:*Object",
+        "s3:AbortMultipartUpload",
         "s3:ListBucket"
       ]
       effect = "Allow"
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The recall image puts libs/ on PYTHONPATH
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "lambda" / "recall" / "libs"))
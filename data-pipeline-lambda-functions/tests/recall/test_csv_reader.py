@@ -0,0 +1,68 @@
+import io
+
+import pandas as pd
+import pytest
+
+from csv_reader import read_csv_chunks
+from output_encoder import encode_frames
+
+HEADER = b"dealer_code,make,status,vin\n"
+
+
+def _stream(data):
+    return io.BufferedReader(io.BytesIO(data))
+
+
+@pytest.mark.parametrize("parser", ["c", "pyarrow"])
+def test_header_only_file_keeps_header(parser):
+    _, chunks = read_csv_chunks(_stream(HEADER), "DEALERWARE-INV", parser=parser)
+    assert b"".join(encode_frames(chunks, "csv")) == HEADER
+
+
+@pytest.mark.parametrize("parser", ["c", "pyarrow"])
+def test_header_only_file_writes_valid_parquet(parser, tmp_path):
+    _, chunks = read_csv_chunks(_stream(HEADER), "DEALERWARE-INV", usecols=["vin", "status"], parser=parser)
+    path = tmp_path / "out.parquet"
+    path.write_bytes(b"".join(encode_frames(chunks, "parquet")))
+    frame = pd.read_parquet(path)
+    assert len(frame) == 0
+    assert sorted(frame.columns) == ["status", "vin"]
+
+
+class _ShortReads(io.RawIOBase):
+    """Raw stream returning at most ``size`` bytes per read, like an SFTP block"""
+
+    def __init__(self, data, size):
+        self._data = memoryview(data)
+        self._size = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self._size, len(self._data))
+        buffer[:count] = self._data[:count]
+        self._data = self._data[count:]
+        return count
+
+
+@pytest.mark.parametrize("parser", ["c", "pyarrow"])
+def test_long_header_values_stay_text(parser):
+    # The header spans many raw reads and more than the stream's buffer
+    columns = [f"column_{index:05d}" for index in range(4000)]
+    data = (",".join(columns) + "\n" + ",".join("0042" for _ in columns) + "\n").encode()
+    stream = io.BufferedReader(_ShortReads(data, 1000), buffer_size=32 * 1024)
+    _, chunks = read_csv_chunks(stream, parser=parser)
+    assert b"".join(encode_frames(chunks, "csv")) == data
+
+
+@pytest.mark.parametrize("parser", ["c", "pyarrow"])
+def test_missing_registered_columns_are_logged(parser, monkeypatch):
+    import csv_reader
+
+    warnings = []
+    monkeypatch.setattr(csv_reader.logger, "warning", warnings.append)
+    data = b"dealer_code,vin\nD1,0042\n"
+    _, chunks = read_csv_chunks(_stream(data), "DEALERWARE-INV", parser=parser)
+    assert b"".join(encode_frames(chunks, "csv")) == data
+    assert len(warnings) == 1 and "status" in warnings[0]
@@ -0,0 +1,47 @@
+import io
+import json
+import logging
+import time
+from datetime import datetime
+
+from logger import CustomJsonFormatter
+from structured_logging import AsyncBatchHandler, DatetimeJsonFormatter
+
+
+class _SlowFormatter:
+    """Wraps a formatter, taking ``delay`` seconds per record like a backlog would."""
+
+    def __init__(self, formatter, delay):
+        self.formatter = formatter
+        self.delay = delay
+
+    def format(self, record):
+        time.sleep(self.delay)
+        return self.formatter.format(record)
+
+
+def _log_two_records(formatter):
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(_SlowFormatter(formatter, 0.2))
+    handler = AsyncBatchHandler(target)
+    logger = logging.getLogger(f"test.timestamps.{type(formatter).__name__}")
+    logger.propagate = False
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+
+    logged_at = time.time()
+    logger.info("first")
+    logger.info("second")
+    handler.flush()
+    handler.close()
+    return logged_at, stream.getvalue().splitlines()
+
+
+def test_timestamps_are_event_times_not_write_times():
+    for formatter in (CustomJsonFormatter(), DatetimeJsonFormatter()):
+        logged_at, lines = _log_two_records(formatter)
+        assert len(lines) == 2
+        for line in lines:
+            timestamp = datetime.fromisoformat(json.loads(line)["timestamp"]).timestamp()
+            assert abs(timestamp - logged_at) < 0.1
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The volvo-infleet image imports its modules as libs.<name> from the lambda root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "lambda" / "volvo-infleet"))
@@ -0,0 +1,98 @@
+import asyncio
+from collections import Counter
+
+from libs.adaptive_scheduler import AdaptiveScheduler, RetryableError
+
+
+def _run(scheduler, items, request):
+    return asyncio.run(scheduler.run(items, request))
+
+
+def _scheduler(**kwargs):
+    kwargs.setdefault("base_backoff", 0.001)
+    kwargs.setdefault("max_backoff", 0.001)
+    return AdaptiveScheduler(**kwargs)
+
+
+def test_retryable_errors_are_retried_until_success():
+    calls = Counter()
+
+    async def request(item):
+        calls[item] += 1
+        if calls[item] < 3:
+            raise RetryableError("unavailable", status=503)
+        return item
+
+    stats = _run(_scheduler(), ["a"], request)
+    assert (stats.succeeded, stats.failed, stats.retries, stats.server_errors) == (1, 0, 2, 2)
+
+
+def test_final_errors_are_not_retried():
+    calls = Counter()
+
+    async def request(item):
+        calls[item] += 1
+        raise ValueError("not found")
+
+    stats = _run(_scheduler(), ["a"], request)
+    assert calls["a"] == 1
+    assert (stats.failed, stats.retries) == (1, 0)
+    assert stats.failures == {"a": "not found"}
+    assert stats.exhausted == set()
+
+
+def test_retries_stop_at_the_cap():
+    calls = Counter()
+
+    async def request(item):
+        calls[item] += 1
+        raise RetryableError("throttled", status=429)
+
+    stats = _run(_scheduler(max_retries=3), ["a"], request)
+    assert calls["a"] == 4
+    assert (stats.failed, stats.retries, stats.throttled) == (1, 3, 4)
+    assert stats.exhausted == {"a"}
+
+
+def test_retry_after_pauses_all_dispatching():
+    started = []
+
+    async def request(item):
+        started.append((item, asyncio.get_running_loop().time()))
+        if item == "a" and len(started) == 1:
+            raise RetryableError("throttled", status=429, retry_after=0.2)
+        return item
+
+    stats = _run(_scheduler(initial_concurrency=1), ["a", "b"], request)
+    assert stats.succeeded == 2
+    (_, throttled_at), *later = started
+    assert [item for item, _ in later] in (["a", "b"], ["b", "a"])
+    assert all(at - throttled_at >= 0.2 for _, at in later)
+
+
+def test_burst_of_failures_halves_once_per_round_trip():
+    scheduler = _scheduler(initial_concurrency=8)
+    retry_limits = []
+    calls = Counter()
+
+    async def request(item):
+        calls[item] += 1
+        if calls[item] == 1:
+            await asyncio.sleep(0.05)
+            raise RetryableError("throttled", status=429)
+        retry_limits.append(scheduler.limit)
+        return item
+
+    stats = _run(scheduler, range(8), request)
+    assert (stats.succeeded, stats.throttled) == (8, 8)
+    assert min(retry_limits) == 4.0
+
+
+def test_decrease_waits_for_a_round_trip():
+    scheduler = _scheduler(initial_concurrency=16)
+    scheduler._smoothed_latency = 1.0
+    scheduler._decrease(10.0)
+    scheduler._decrease(10.5)
+    assert scheduler.limit == 8.0
+    scheduler._decrease(11.1)
+    assert scheduler.limit == 4.0
@@ -0,0 +1,60 @@
+import httpx
+import pytest
+
+from libs import http_transport
+from libs.http_transport import HttpTransport, RetryPolicy
+
+
+def test_retry_after_is_waited_in_full():
+    policy = RetryPolicy(max_backoff=30.0, retry_budget=120.0)
+    assert policy.backoff(0, retry_after=90.0) == 90.0
+
+
+def test_retry_after_beyond_the_budget_gives_up():
+    policy = RetryPolicy(retry_budget=120.0)
+    assert policy.backoff(0, retry_after=121.0) is None
+    assert policy.backoff(2, retry_after=60.0, waited=70.0) is None
+
+
+def test_jittered_backoff_stays_under_max_backoff():
+    policy = RetryPolicy(base_backoff=1.0, max_backoff=4.0)
+    assert all(0 <= policy.backoff(attempt) <= 4.0 for attempt in range(10))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waited = []
+
+    async def sleep(delay):
+        waited.append(delay)
+
+    monkeypatch.setattr(http_transport.asyncio, "sleep", sleep)
+    return waited
+
+
+def _transport(responses, policy):
+    replies = iter(responses)
+    transport = HttpTransport(retry_policy=policy)
+    transport._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: next(replies)))
+    return transport
+
+
+def test_transport_waits_the_full_retry_after(sleeps):
+    transport = _transport(
+        [httpx.Response(429, headers={"Retry-After": "45"}), httpx.Response(200, json=[])],
+        RetryPolicy(max_backoff=30.0, retry_budget=120.0),
+    )
+    response = transport.run(transport.request("GET", "https://api.test/loaners"))
+    assert response.status_code == 200
+    assert sleeps == [45.0]
+
+
+def test_transport_returns_the_429_when_the_budget_runs_out(sleeps):
+    transport = _transport(
+        [httpx.Response(429, headers={"Retry-After": "80"}),
+         httpx.Response(429, headers={"Retry-After": "80"})],
+        RetryPolicy(retry_budget=120.0),
+    )
+    response = transport.run(transport.request("GET", "https://api.test/loaners"))
+    assert response.status_code == 429
+    assert sleeps == [80.0]
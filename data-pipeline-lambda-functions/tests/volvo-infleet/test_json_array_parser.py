@@ -0,0 +1,44 @@
+import pytest
+
+from libs.api_client import _JsonArrayParser
+
+
+def _parse(*chunks):
+    parser = _JsonArrayParser()
+    items = [item for chunk in chunks for item in parser.feed(chunk)]
+    parser.close()
+    return items
+
+
+def test_element_split_across_chunks():
+    parser = _JsonArrayParser()
+    assert parser.feed(b'[{"vin": "A"}, {"vin"') == [{"vin": "A"}]
+    assert parser.feed(b': "B"}]') == [{"vin": "B"}]
+    parser.close()
+
+
+def test_multibyte_character_split_across_chunks():
+    body = '[{"retailerName": "Volvo Göteborg"}]'.encode("utf-8")
+    split = body.index("ö".encode("utf-8")) + 1
+    assert _parse(body[:split], body[split:]) == [{"retailerName": "Volvo Göteborg"}]
+
+
+def test_every_byte_in_its_own_chunk():
+    body = b'[{"vin": "A", "n": [1, 2]}, {"vin": "B"}]'
+    assert _parse(*(body[i:i + 1] for i in range(len(body)))) == [{"vin": "A", "n": [1, 2]}, {"vin": "B"}]
+
+
+@pytest.mark.parametrize("body", [b"[]", b" [ ] ", b"null", b"{}"])
+def test_empty_bodies_have_no_elements(body):
+    assert _parse(body) == []
+
+
+def test_non_empty_object_is_rejected():
+    with pytest.raises(ValueError, match="Expected a JSON array"):
+        _parse(b'{"error": "boom"}')
+
+
+@pytest.mark.parametrize("body", [b'[{"vin": "A"}, {"vin": "B"', b'[{"vin": "A"}'])
+def test_truncated_array_is_rejected(body):
+    with pytest.raises(ValueError, match="Truncated"):
+        _parse(body)